@@ -5,12 +5,30 @@ Extracts fundamental frequency and harmonics from car horn audio samples.
 Usage:
     python analyze_horn.py <audio_file>
     python analyze_horn.py --batch <directory>
+    python analyze_horn.py --batch <directory> --trace trace.jsonl [--trace-memory]
+    python analyze_horn.py --batch <directory> --profile batch.prof
+    python analyze_horn.py --batch <directory> --spectra spectra/
+    python analyze_horn.py --batch <directory> --decoder polyphase
+    python analyze_horn.py --batch <directory> --adaptive
+    python analyze_horn.py --batch <directory> --output results.jsonl [--resume]
+    python analyze_horn.py --batch <directory> --output results.jsonl --checkpoint
+
+Stages (decode, resample, segment, stft, peaks, plot) are separate
+functions, so sampling profilers attribute time to them cleanly, e.g.
+    py-spy record -o flame.svg -- python analyze_horn.py --batch samples/
 """
 
 import numpy as np
 import argparse
 from pathlib import Path
 
+from batch_output import open_writer
+from kernels import first_run_above, frame_rms
+from music_notes import freq_to_note
+from run_manifest import RunManifest
+from spectrum_archive import SpectrumArchive
+from stage_trace import StageTrace, stage
+
 # Check for required packages
 try:
     import librosa
@@ -26,55 +44,179 @@ except ImportError:
     print("Warning: matplotlib not installed, plotting disabled")
 
 
-def load_audio(filepath: str, sr: int = 22050) -> tuple[np.ndarray, int]:
+# Peak-picking parameters used by pick_peaks (peak_engine.py can tune them
+# over a whole spectrum archive)
+PEAK_DEFAULTS = {
+    "height": -40,        # dB floor for a peak
+    "distance": 20,       # min bins between peaks
+    "prominence": 10,     # dB above local noise floor
+    "horn_min": 200,      # horn fundamental range (Hz)
+    "horn_max": 800,
+    "dual_min": 1.15,     # second-horn ratio range (minor to major third)
+    "dual_max": 1.35,
+    "major_split": 1.28,  # ratios above this count as a major third
+}
+
+
+# Decode backends for load_audio, slowest / most accurate first:
+#   librosa    soxr high-quality resampling, as librosa.load(sr=22050) does
+#   soxr       soxr low-quality mode (still band-limited, several times faster)
+#   polyphase  scipy.signal.resample_poly with its default Kaiser FIR
+#   native     no resampling; analysis runs at the file's own sample rate
+DECODE_BACKENDS = ("librosa", "soxr", "polyphase", "native")
+
+
+def load_audio(filepath: str, sr: int = 22050, trace: StageTrace = None,
+               backend: str = "librosa") -> tuple[np.ndarray, int]:
     """Load audio file and return samples + sample rate."""
-    y, sr = librosa.load(filepath, sr=sr)
+    with stage(trace, "decode"):
+        y, native_sr = decode_audio(filepath)
+    if backend == "native":
+        return y, native_sr
+    with stage(trace, "resample"):
+        y = resample_audio(y, native_sr, sr, backend)
     return y, sr
 
 
+def decode_audio(filepath: str) -> tuple[np.ndarray, int]:
+    """Decode audio file to mono float32 at its native sample rate."""
+    import soundfile as sf
+    try:
+        y, native_sr = sf.read(filepath, dtype="float32", always_2d=True)
+    except sf.LibsndfileError:
+        # Formats libsndfile can't read (m4a, webm, ...) go through audioread
+        return librosa.load(filepath, sr=None)
+    return y.mean(axis=1), native_sr
+
+
+def resample_audio(y: np.ndarray, orig_sr: int, sr: int, backend: str = "librosa") -> np.ndarray:
+    """Resample to the analysis rate with the given DECODE_BACKENDS method."""
+    if orig_sr == sr:
+        return y
+    if backend == "librosa":
+        return librosa.resample(y, orig_sr=orig_sr, target_sr=sr, res_type="soxr_hq")
+    if backend == "soxr":
+        import soxr
+        return soxr.resample(y, orig_sr, sr, quality="LQ")
+    if backend == "polyphase":
+        from math import gcd
+        from scipy.signal import resample_poly
+        g = gcd(orig_sr, sr)
+        return resample_poly(y, sr // g, orig_sr // g).astype(np.float32)
+    raise ValueError(f"Unknown decode backend '{backend}' (choose from {', '.join(DECODE_BACKENDS)})")
+
+
+def analysis_n_fft(sr: int) -> int:
+    """
+    FFT size giving roughly the 5.4 Hz bins of n_fft=4096 at 22050 Hz, so
+    pick_peaks' bin-based distance means the same at native sample rates.
+    """
+    return int(2 ** np.round(np.log2(4096 * sr / 22050)))
+
+
 def find_horn_segment(y: np.ndarray, sr: int, threshold_db: float = -20) -> tuple[int, int]:
     """Find the loudest segment (likely the horn) in the audio."""
     # Compute RMS energy
-    rms = librosa.feature.rms(y=y)[0]
+    rms = frame_rms(y)
     rms_db = librosa.amplitude_to_db(rms)
 
-    # Find segments above threshold
-    above_threshold = rms_db > threshold_db
+    # First continuous segment above threshold (frame just before it to its last frame)
+    start, end = first_run_above(rms_db, threshold_db)
 
-    if not above_threshold.any():
+    if start < 0:
         # Use whole signal if nothing above threshold
         return 0, len(y)
 
-    # Find start and end of loudest continuous segment
-    starts = np.where(np.diff(above_threshold.astype(int)) == 1)[0]
-    ends = np.where(np.diff(above_threshold.astype(int)) == -1)[0]
-
-    if len(starts) == 0:
-        starts = np.array([0])
-    if len(ends) == 0:
-        ends = np.array([len(rms) - 1])
-    if ends[0] < starts[0]:
-        starts = np.insert(starts, 0, 0)
-    if starts[-1] > ends[-1]:
-        ends = np.append(ends, len(rms) - 1)
-
     # Convert frame indices to samples
     hop_length = 512  # librosa default
-    start_sample = starts[0] * hop_length
-    end_sample = ends[0] * hop_length
+    return int(start * hop_length), int(end * hop_length)
+
 
-    return int(start_sample), int(end_sample)
+def extract_frequencies(y: np.ndarray, sr: int, n_fft: int = 4096, trace: StageTrace = None,
+                        adaptive: bool = False, on_spectrum=None) -> dict:
+    """
+    Extract fundamental frequency and harmonics from audio segment.
+    on_spectrum(freqs, avg_spectrum), if given, sees the averaged spectrum
+    before peak picking (analyze_file archives it this way).
+    """
 
+    with stage(trace, "stft"):
+        spectrum = adaptive_spectrum if adaptive else average_spectrum
+        freqs, avg_spectrum = spectrum(y, sr, n_fft)
+    if on_spectrum is not None:
+        on_spectrum(freqs, avg_spectrum)
 
-def extract_frequencies(y: np.ndarray, sr: int, n_fft: int = 4096) -> dict:
-    """Extract fundamental frequency and harmonics from audio segment."""
+    with stage(trace, "peaks"):
+        return pick_peaks(freqs, avg_spectrum)
 
+
+def average_spectrum(y: np.ndarray, sr: int, n_fft: int = 4096) -> tuple[np.ndarray, np.ndarray]:
+    """Return FFT bin frequencies and the time-averaged magnitude spectrum."""
     # Compute spectrogram
     D = np.abs(librosa.stft(y, n_fft=n_fft))
     freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
 
     # Average spectrum across time
-    avg_spectrum = np.mean(D, axis=1)
+    return freqs, np.mean(D, axis=1)
+
+
+def adaptive_spectrum(y: np.ndarray, sr: int, n_fft: int = 4096, min_frames: int = 2,
+                      batch: int = 8, n_peaks: int = 6, tol_db: float = 0.5) -> tuple[np.ndarray, np.ndarray]:
+    """
+    average_spectrum with the window and hop fitted to the segment length.
+
+    Short segments get a shorter Hann window (the longest power of two that
+    fits min_frames frames), so frames hold signal rather than zero padding.
+    The FFT is still n_fft long (zero-padded) and magnitudes are rescaled to
+    n_fft's level, so bins and dB levels match average_spectrum and
+    pick_peaks' parameters mean the same.
+
+    Long segments use a half-window hop and stop early: frames are averaged
+    in batches, in a strided order that spans the whole segment first, until
+    the n_peaks loudest spectral peaks keep the same bins and move less than
+    tol_db on two consecutive batches.
+    """
+    win = n_fft
+    while win > 256 and (len(y) - win) // (win // 4) + 1 < min_frames:
+        win //= 2
+    hop = win // 2 if win == n_fft else win // 4
+    if len(y) < win:
+        y = np.pad(y, (0, win - len(y)))
+
+    frames = np.lib.stride_tricks.sliding_window_view(y, win)[::hop]
+    stride = max(1, len(frames) // batch)
+    order = np.concatenate([np.arange(offset, len(frames), stride) for offset in range(stride)])
+    window = np.hanning(win).astype(np.float32) * (n_fft / win)
+
+    total = np.zeros(n_fft // 2 + 1)
+    previous = None
+    stable = 0
+    for start in range(0, len(order), batch):
+        total += np.abs(np.fft.rfft(frames[order[start:start + batch]] * window, n=n_fft, axis=1)).sum(axis=0)
+        mean = total / min(start + batch, len(order))
+
+        db = 20 * np.log10(mean + 1e-12)
+        is_peak = (db[1:-1] > db[:-2]) & (db[1:-1] >= db[2:])
+        peaks = np.flatnonzero(is_peak) + 1
+        peaks = np.sort(peaks[np.argsort(db[peaks])[-n_peaks:]])
+        if previous is not None and np.array_equal(peaks, previous[0]) and \
+                np.abs(db[peaks] - previous[1]).max() < tol_db:
+            stable += 1
+            if stable >= 2:
+                break
+        else:
+            stable = 0
+        previous = (peaks, db[peaks])
+
+    return np.fft.rfftfreq(n_fft, 1 / sr), mean
+
+
+def pick_peaks(freqs: np.ndarray, avg_spectrum: np.ndarray, params: dict = None) -> dict:
+    """
+    Pick fundamental, harmonics and dual horn from an averaged spectrum.
+    `params` overrides entries of PEAK_DEFAULTS.
+    """
+    p = {**PEAK_DEFAULTS, **(params or {})}
 
     # Find peaks (potential fundamental and harmonics)
     from scipy.signal import find_peaks
@@ -83,7 +225,8 @@ def extract_frequencies(y: np.ndarray, sr: int, n_fft: int = 4096) -> dict:
     avg_spectrum_db = librosa.amplitude_to_db(avg_spectrum)
 
     # Find peaks at least 10dB above local noise floor
-    peaks, properties = find_peaks(avg_spectrum_db, height=-40, distance=20, prominence=10)
+    peaks, properties = find_peaks(avg_spectrum_db, height=p["height"], distance=p["distance"],
+                                   prominence=p["prominence"])
 
     if len(peaks) == 0:
         return {"error": "No clear peaks found"}
@@ -98,7 +241,7 @@ def extract_frequencies(y: np.ndarray, sr: int, n_fft: int = 4096) -> dict:
     peak_amps = peak_amps[sort_idx]
 
     # Filter to car horn frequency range (200-800 Hz for fundamentals)
-    horn_mask = (peak_freqs >= 200) & (peak_freqs <= 800)
+    horn_mask = (peak_freqs >= p["horn_min"]) & (peak_freqs <= p["horn_max"])
     horn_freqs = peak_freqs[horn_mask]
     horn_amps = peak_amps[horn_mask]
 
@@ -121,8 +264,8 @@ def extract_frequencies(y: np.ndarray, sr: int, n_fft: int = 4096) -> dict:
         if f != fundamental:
             # Check if it's a musical interval from fundamental
             ratio = f / fundamental if f > fundamental else fundamental / f
-            if 1.15 < ratio < 1.35:  # minor or major third
-                interval = "minor third" if ratio < 1.28 else "major third"
+            if p["dual_min"] < ratio < p["dual_max"]:  # minor or major third
+                interval = "minor third" if ratio < p["major_split"] else "major third"
                 dual_horn = {"frequency": f, "interval": interval, "ratio": ratio}
                 break
 
@@ -136,25 +279,6 @@ def extract_frequencies(y: np.ndarray, sr: int, n_fft: int = 4096) -> dict:
     }
 
 
-def freq_to_note(freq: float) -> str:
-    """Convert frequency to musical note name."""
-    if freq <= 0:
-        return "N/A"
-
-    notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-
-    # A4 = 440 Hz
-    semitones_from_a4 = 12 * np.log2(freq / 440)
-    semitone_idx = int(round(semitones_from_a4)) + 9  # A is 9 semitones from C
-
-    note = notes[semitone_idx % 12]
-    octave = 4 + (semitone_idx + 3) // 12
-
-    cents_off = int((semitones_from_a4 - round(semitones_from_a4)) * 100)
-
-    return f"{note}{octave} ({cents_off:+d} cents)"
-
-
 def plot_spectrum(y: np.ndarray, sr: int, results: dict, save_path: str = None):
     """Plot the frequency spectrum with annotated peaks."""
     if plt is None:
@@ -170,9 +294,7 @@ def plot_spectrum(y: np.ndarray, sr: int, results: dict, save_path: str = None):
     ax1.set_title("Waveform")
 
     # Spectrum
-    D = np.abs(librosa.stft(y, n_fft=4096))
-    freqs = librosa.fft_frequencies(sr=sr, n_fft=4096)
-    avg_spectrum = np.mean(D, axis=1)
+    freqs, avg_spectrum = average_spectrum(y, sr, analysis_n_fft(sr))
     avg_spectrum_db = librosa.amplitude_to_db(avg_spectrum)
 
     ax2.plot(freqs, avg_spectrum_db)
@@ -202,34 +324,66 @@ def plot_spectrum(y: np.ndarray, sr: int, results: dict, save_path: str = None):
         plt.show()
 
 
-def analyze_file(filepath: str, plot: bool = False) -> dict:
-    """Analyze a single audio file."""
+def analyze_file(filepath: str, plot: bool = False, trace: StageTrace = None,
+                 archive: SpectrumArchive = None, backend: str = "librosa", adaptive: bool = False) -> dict:
+    """
+    Analyze a single audio file, optionally recording stage timings on
+    `trace` and storing the averaged spectrum in `archive`. `backend` is one
+    of DECODE_BACKENDS; `adaptive` uses adaptive_spectrum for the STFT.
+    """
     print(f"\nAnalyzing: {filepath}")
 
-    y, sr = load_audio(filepath)
+    if trace is not None:
+        trace.start_file(str(filepath))
+    try:
+        results = _analyze_file(filepath, plot, trace, archive, backend, adaptive)
+    except Exception:
+        if trace is not None:
+            trace.end_file(status="exception")
+        raise
+
+    if trace is not None:
+        trace.end_file(status="error" if "error" in results else "ok")
+    return results
+
+
+def _analyze_file(filepath: str, plot: bool, trace: StageTrace, archive: SpectrumArchive,
+                  backend: str, adaptive: bool) -> dict:
+    y, sr = load_audio(filepath, trace=trace, backend=backend)
 
     # Find horn segment
-    start, end = find_horn_segment(y, sr)
+    with stage(trace, "segment"):
+        start, end = find_horn_segment(y, sr)
     y_horn = y[start:end]
 
     print(f"  Audio length: {len(y)/sr:.2f}s, Horn segment: {(end-start)/sr:.2f}s")
 
     # Extract frequencies
-    results = extract_frequencies(y_horn, sr)
+    spectrum = {}
+
+    def keep_spectrum(freqs, avg_spectrum):
+        spectrum["avg"] = avg_spectrum
+
+    results = extract_frequencies(y_horn, sr, analysis_n_fft(sr), trace, adaptive,
+                                  keep_spectrum if archive is not None else None)
 
     if "error" in results:
         print(f"  Error: {results['error']}")
-        return results
+    else:
+        print(f"  Fundamental: {results['fundamental_hz']:.1f} Hz ({results['fundamental_note']})")
 
-    print(f"  Fundamental: {results['fundamental_hz']:.1f} Hz ({results['fundamental_note']})")
+        if results.get("dual_horn"):
+            dh = results["dual_horn"]
+            print(f"  Dual horn: {dh['frequency']:.1f} Hz ({dh['interval']}, ratio {dh['ratio']:.3f})")
 
-    if results.get("dual_horn"):
-        dh = results["dual_horn"]
-        print(f"  Dual horn: {dh['frequency']:.1f} Hz ({dh['interval']}, ratio {dh['ratio']:.3f})")
+        if plot:
+            plot_path = Path(filepath).with_suffix('.png')
+            with stage(trace, "plot"):
+                plot_spectrum(y_horn, sr, results, str(plot_path))
 
-    if plot:
-        plot_path = Path(filepath).with_suffix('.png')
-        plot_spectrum(y_horn, sr, results, str(plot_path))
+    # Archive last: a file that raises before here is retried without having used up a row
+    if archive is not None:
+        archive.append(Path(filepath).name, spectrum["avg"], sr)
 
     return results
 
@@ -239,38 +393,128 @@ def main():
     parser.add_argument("input", help="Audio file or directory (with --batch)")
     parser.add_argument("--batch", action="store_true", help="Process all audio files in directory")
     parser.add_argument("--plot", action="store_true", help="Generate spectrum plots")
-    parser.add_argument("--output", "-o", help="Output CSV file for batch results")
+    parser.add_argument("--output", "-o",
+                        help="Output file, written as files finish: .jsonl or .parquet (full "
+                             "results), .csv or any other suffix (summary columns)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Keep an existing --output and skip files already in it")
+    parser.add_argument("--flush-every", type=int, help="Rows between output flushes")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="Track per-file status in <output>.manifest.jsonl; on restart skip "
+                             "finished files and retry failed ones")
+    parser.add_argument("--max-retries", type=int, default=2,
+                        help="Retries per failing file with --checkpoint (default: 2)")
+    parser.add_argument("--trace", help="Append per-file stage timings to this JSONL file")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record bytes allocated per stage (slower)")
+    parser.add_argument("--profile", help="Run under cProfile and write stats to this file")
+    parser.add_argument("--spectra", help="Store averaged spectra in a memory-mapped archive directory")
+    parser.add_argument("--decoder", choices=DECODE_BACKENDS, default="librosa",
+                        help="Decode / resampling backend (default: librosa)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Fit the STFT window / hop to each horn segment and stop averaging "
+                             "once the spectrum converges")
 
     args = parser.parse_args()
 
+    if args.checkpoint and not args.output:
+        parser.error("--checkpoint needs --output (finished files are read back from it)")
+    if args.spectra and args.decoder == "native":
+        parser.error("--spectra needs a fixed analysis rate; use a resampling --decoder")
+
+    trace = None
+    if args.trace or args.trace_memory:
+        trace = StageTrace(args.trace, track_memory=args.trace_memory)
+
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        run(args, trace)
+    finally:
+        if args.profile:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"\nProfile saved to {args.profile} (top functions by cumulative time):")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+        if trace is not None:
+            print("\n" + trace.summary_table())
+            if args.trace:
+                print(f"\nStage trace saved to {args.trace}")
+            trace.close()
+
+
+def run(args, trace: StageTrace = None):
+    """Run single-file or batch analysis for parsed command-line args."""
     if args.batch:
         input_dir = Path(args.input)
         audio_files = list(input_dir.glob("*.wav")) + list(input_dir.glob("*.mp3")) + \
                       list(input_dir.glob("*.m4a")) + list(input_dir.glob("*.flac")) + \
                       list(input_dir.glob("*.webm")) + list(input_dir.glob("*.opus"))
-
-        results = []
-        for f in audio_files:
-            r = analyze_file(str(f), plot=args.plot)
-            r["filename"] = f.name
-            results.append(r)
-
-        if args.output:
-            import csv
-            with open(args.output, 'w', newline='') as csvfile:
-                writer = csv.DictWriter(csvfile,
-                    fieldnames=["filename", "fundamental_hz", "fundamental_note", "dual_horn"])
-                writer.writeheader()
-                for r in results:
-                    writer.writerow({
-                        "filename": r.get("filename", ""),
-                        "fundamental_hz": r.get("fundamental_hz", ""),
-                        "fundamental_note": r.get("fundamental_note", ""),
-                        "dual_horn": r.get("dual_horn", {}).get("frequency", "") if r.get("dual_horn") else ""
-                    })
-            print(f"\nResults saved to {args.output}")
     else:
-        analyze_file(args.input, plot=args.plot)
+        audio_files = [Path(args.input)]
+
+    writer = None
+    if args.output:
+        writer = open_writer(args.output, resume=args.resume or args.checkpoint,
+                             flush_every=args.flush_every)
+        if writer.done:
+            print(f"Resuming: {len(writer.done)} files already in {args.output}")
+
+    manifest = None
+    if args.checkpoint:
+        manifest_path = f"{args.output}.manifest.jsonl"
+        manifest = RunManifest(manifest_path, [f.name for f in audio_files],
+                               max_attempts=args.max_retries + 1, completed=writer.done)
+        by_name = {f.name: f for f in audio_files}
+        audio_files = [by_name[name] for name in manifest.to_run() if name in by_name]
+        print(f"Checkpointing to {manifest_path}: {len(audio_files)} files to run")
+    elif writer is not None:
+        audio_files = [f for f in audio_files if f.name not in writer.done]
+
+    archive = SpectrumArchive(args.spectra, capacity=len(audio_files)) if args.spectra else None
+
+    try:
+        queue = list(audio_files)
+        while queue:
+            retry = []
+            for f in queue:
+                if manifest is not None:
+                    manifest.start(f.name)
+                try:
+                    r = analyze_file(str(f), plot=args.plot, trace=trace, archive=archive,
+                                     backend=args.decoder, adaptive=args.adaptive)
+                except Exception as e:
+                    if manifest is None:
+                        raise
+                    print(f"  Failed: {type(e).__name__}: {e}")
+                    manifest.fail(f.name, f"{type(e).__name__}: {e}")
+                    if manifest.entries[f.name]["attempts"] < manifest.max_attempts:
+                        retry.append(f)
+                    continue
+
+                r["filename"] = f.name
+                if writer is not None:
+                    writer.write(r)
+                if manifest is not None:
+                    manifest.finish(f.name)
+            queue = retry
+    finally:
+        if archive is not None:
+            archive.close()
+            print(f"\nSpectra archived to {args.spectra} ({archive.n_rows} files)")
+        if writer is not None:
+            writer.close()
+            print(f"\nResults saved to {args.output}")
+        if manifest is not None:
+            counts = manifest.counts()
+            manifest.close()
+            print(f"Checkpoint: {counts['done']} done, {counts['failed']} failed (will retry), "
+                  f"{counts['gave_up']} gave up after {manifest.max_attempts} attempts, "
+                  f"{counts['pending']} pending")
 
 
 if __name__ == "__main__":
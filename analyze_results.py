@@ -1,10 +1,17 @@
 """
 Analyze car horn frequency data and generate summary statistics.
+
+Group tables carry 95% bootstrap CIs for each mean and a permutation
+p-value for "no difference between groups" (see bootstrap.py).
 """
 
 import pandas as pd
 import numpy as np
 
+from bootstrap import group_table, permutation_pvalue
+
+N_BOOT = 100_000  # bootstrap / permutation replicates per grouping
+
 # Load data
 df = pd.read_csv('horn_data.csv')
 
@@ -89,27 +96,36 @@ print("\n" + "=" * 60)
 print("BY MANUFACTURER")
 print("=" * 60)
 by_make = df.groupby('make')['fundamental_hz'].agg(['mean', 'std', 'count']).round(0)
+by_make = by_make.join(group_table(df, 'make', n_replicates=N_BOOT)[['ci_low', 'ci_high']].round(0))
 by_make = by_make.sort_values('mean')
 print(by_make.to_string())
+print(f"\nPermutation p-value: {permutation_pvalue(df['fundamental_hz'], df['make'], N_BOOT):.4f}")
 
 print("\n" + "=" * 60)
 print("BY COUNTRY OF ORIGIN")
 print("=" * 60)
 by_country = df.groupby('country')['fundamental_hz'].agg(['mean', 'std', 'count']).round(0)
+by_country = by_country.join(group_table(df, 'country', n_replicates=N_BOOT)[['ci_low', 'ci_high']].round(0))
 print(by_country.to_string())
+print(f"\nPermutation p-value: {permutation_pvalue(df['fundamental_hz'], df['country'], N_BOOT):.4f}")
 
 print("\n" + "=" * 60)
 print("BY SEGMENT")
 print("=" * 60)
-by_segment = df.groupby('segment')['fundamental_hz'].agg(['mean', 'count']).round(0).sort_values('mean')
+by_segment = df.groupby('segment')['fundamental_hz'].agg(['mean', 'count']).round(0)
+by_segment = by_segment.join(group_table(df, 'segment', n_replicates=N_BOOT)[['ci_low', 'ci_high']].round(0))
+by_segment = by_segment.sort_values('mean')
 print(by_segment.to_string())
+print(f"\nPermutation p-value: {permutation_pvalue(df['fundamental_hz'], df['segment'], N_BOOT):.4f}")
 
 print("\n" + "=" * 60)
 print("LUXURY vs NON-LUXURY")
 print("=" * 60)
 by_luxury = df.groupby('is_luxury')['fundamental_hz'].agg(['mean', 'std', 'count']).round(0)
+by_luxury = by_luxury.join(group_table(df, 'is_luxury', n_replicates=N_BOOT)[['ci_low', 'ci_high']].round(0))
 by_luxury.index = ['Mass Market', 'Luxury']
 print(by_luxury.to_string())
+print(f"\nPermutation p-value: {permutation_pvalue(df['fundamental_hz'], df['is_luxury'], N_BOOT):.4f}")
 
 print("\n" + "=" * 60)
 print("DUAL HORN VEHICLES")
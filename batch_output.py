@@ -0,0 +1,214 @@
+"""
+Streaming writers for analyze_horn.py batch results.
+
+Rows are appended as each file finishes and flushed periodically, so an
+interrupted run keeps everything written so far and can be resumed: the
+writer reports which filenames are already in the output, and reopening in
+resume mode appends after them.
+
+Formats (chosen by the output path's suffix):
+    .jsonl    Full nested result per line (harmonics, all peaks, amplitudes)
+    .parquet  Full result with list/struct columns, written as a directory
+              of part files (one per flush); requires pyarrow
+    .csv      The original flat columns: filename, fundamental_hz,
+              fundamental_note, dual_horn (also used for any other suffix)
+"""
+
+import csv
+import json
+import os
+from pathlib import Path
+
+CSV_FIELDS = ["filename", "fundamental_hz", "fundamental_note", "dual_horn"]
+
+
+def to_record(result: dict) -> dict:
+    """Convert an analyze_file result into plain JSON-friendly types."""
+    record = {"filename": result.get("filename", "")}
+    if "error" in result:
+        record["error"] = result["error"]
+        return record
+
+    dual = result.get("dual_horn")
+    record.update({
+        "fundamental_hz": float(result["fundamental_hz"]),
+        "fundamental_note": result["fundamental_note"],
+        "dual_horn": {
+            "frequency": float(dual["frequency"]),
+            "interval": dual["interval"],
+            "ratio": float(dual["ratio"]),
+        } if dual else None,
+        "harmonics": [{"frequency_hz": float(f), "harmonic": int(n)} for f, n in result["harmonics"]],
+        "all_peaks_hz": [float(f) for f in result["all_peaks_hz"]],
+        "peak_amplitudes_db": [float(a) for a in result["peak_amplitudes_db"]],
+    })
+    return record
+
+
+def _drop_partial_line(path: Path):
+    """Truncate a text file after its last newline (a crash may leave half a row)."""
+    with open(path, "rb+") as f:
+        data = f.read()
+        keep = data.rfind(b"\n") + 1
+        if keep < len(data):
+            f.truncate(keep)
+
+
+class _LineWriter:
+    """
+    Shared append/flush/resume logic for line-oriented formats.
+    Subclasses provide _read_done() (filenames already in the file) and
+    _write_row(result).
+    """
+
+    def __init__(self, path: str, resume: bool = False, flush_every: int = 20):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self._pending = 0
+
+        if resume and self.path.exists():
+            _drop_partial_line(self.path)
+            self.done = self._read_done()
+            self._file = open(self.path, "a", newline="")
+        else:
+            self.done = set()
+            self._file = open(self.path, "w", newline="")
+
+    def write(self, result: dict):
+        self._write_row(result)
+        self.done.add(result.get("filename", ""))
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class JsonlWriter(_LineWriter):
+    def _read_done(self) -> set:
+        done = set()
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    done.add(json.loads(line)["filename"])
+        return done
+
+    def _write_row(self, result: dict):
+        self._file.write(json.dumps(to_record(result)) + "\n")
+
+
+class CsvWriter(_LineWriter):
+    def __init__(self, path: str, resume: bool = False, flush_every: int = 20):
+        super().__init__(path, resume, flush_every)
+        self._writer = csv.DictWriter(self._file, fieldnames=CSV_FIELDS)
+        if self._file.tell() == 0:
+            self._writer.writeheader()
+
+    def _read_done(self) -> set:
+        with open(self.path, newline="") as f:
+            return {row["filename"] for row in csv.DictReader(f)}
+
+    def _write_row(self, r: dict):
+        self._writer.writerow({
+            "filename": r.get("filename", ""),
+            "fundamental_hz": r.get("fundamental_hz", ""),
+            "fundamental_note": r.get("fundamental_note", ""),
+            "dual_horn": r.get("dual_horn", {}).get("frequency", "") if r.get("dual_horn") else ""
+        })
+
+
+class ParquetWriter:
+    """
+    Buffers records and writes one part file per flush into a directory,
+    so every flushed row survives a crash (a single Parquet file is only
+    readable once its footer is written).
+    """
+
+    def __init__(self, path: str, resume: bool = False, flush_every: int = 500):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("Install pyarrow for Parquet output: pip install pyarrow")
+            exit(1)
+        self._pa, self._pq = pa, pq
+
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self._buffer = []
+
+        self.schema = pa.schema([
+            ("filename", pa.string()),
+            ("error", pa.string()),
+            ("fundamental_hz", pa.float64()),
+            ("fundamental_note", pa.string()),
+            ("dual_horn", pa.struct([("frequency", pa.float64()), ("interval", pa.string()),
+                                     ("ratio", pa.float64())])),
+            ("harmonics", pa.list_(pa.struct([("frequency_hz", pa.float64()), ("harmonic", pa.int32())]))),
+            ("all_peaks_hz", pa.list_(pa.float64())),
+            ("peak_amplitudes_db", pa.list_(pa.float64())),
+        ])
+
+        if self.path.exists() and not resume:
+            for part in self.path.glob("part-*.parquet"):
+                part.unlink()
+        self.path.mkdir(parents=True, exist_ok=True)
+        for stale in self.path.glob(".part-*.tmp"):
+            stale.unlink()  # left by a crash mid-flush
+
+        parts = sorted(self.path.glob("part-*.parquet"))
+        self._next_part = len(parts)
+        self.done = set()
+        for part in parts:
+            self.done.update(pq.read_table(part, columns=["filename"]).column("filename").to_pylist())
+
+    def write(self, result: dict):
+        self._buffer.append(to_record(result))
+        self.done.add(result.get("filename", ""))
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        table = self._pa.Table.from_pylist(self._buffer, schema=self.schema)
+        final = self.path / f"part-{self._next_part:05d}.parquet"
+        # Dot-prefixed, so readers of the directory skip it until it is renamed
+        tmp = self.path / f".{final.stem}.tmp"
+        self._pq.write_table(table, tmp)
+        os.replace(tmp, final)  # a part is either complete or absent
+        self._next_part += 1
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+
+
+def open_writer(path: str, resume: bool = False, flush_every: int = None):
+    """Open the streaming writer matching `path`'s suffix (CSV for unknown suffixes)."""
+    suffix = Path(path).suffix.lower()
+    writers = {".jsonl": JsonlWriter, ".parquet": ParquetWriter}
+    kwargs = {"resume": resume}
+    if flush_every is not None:
+        kwargs["flush_every"] = flush_every
+    return writers.get(suffix, CsvWriter)(path, **kwargs)
+
+
+def read_results(path: str):
+    """Load a batch output (any supported format) as a pandas DataFrame."""
+    import pandas as pd
+
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".jsonl":
+        return pd.read_json(path, lines=True)
+    if suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
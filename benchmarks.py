@@ -0,0 +1,316 @@
+"""
+Benchmarks for the spectral and consonance hot paths.
+
+Runs entirely offline on synthetic signals (see synthetic_horns.py) and
+reports throughput and peak traced memory per case. Results can be saved
+as a baseline and later runs compared against it.
+
+Usage:
+    python benchmarks.py                          # quick profile
+    python benchmarks.py --profile full           # adds 10 min / 1 h clips, 10^6-car fleets
+    python benchmarks.py --filter dissonance      # only matching cases
+    python benchmarks.py --save bench_baseline.json
+    python benchmarks.py --compare bench_baseline.json
+    python benchmarks.py --decode-report          # speed + accuracy per decode backend
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+import synthetic_horns as synth
+
+SR = 22050
+
+PROFILES = {
+    "quick": {"clip_seconds": [1, 10, 60], "fleet_sizes": [160, 10_000]},
+    "full": {"clip_seconds": [1, 10, 60, 600, 3600], "fleet_sizes": [160, 10_000, 1_000_000]},
+}
+
+
+class Case:
+    """A single benchmark: setup() builds inputs, run(inputs) is timed."""
+
+    def __init__(self, name: str, setup, run, items: int, unit: str):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.items = items
+        self.unit = unit
+
+
+def build_cases(profile: dict, workdir: Path) -> list[Case]:
+    """Build every benchmark case for a profile."""
+    from analyze_horn import (DECODE_BACKENDS, analyze_file, extract_frequencies,
+                              find_horn_segment, load_audio)
+    from consonance_analysis import (chord_dissonance, monte_carlo_analysis,
+                                     monte_carlo_stream, sethares_dissonance,
+                                     sethares_dissonance_array, trio_dissonance)
+    import kernels
+
+    cases = []
+
+    # Spectral path: segmentation and frequency extraction per clip length
+    for seconds in profile["clip_seconds"]:
+        n = seconds * SR
+        for kind in ("pure", "dual", "noise"):
+            make = (lambda kind=kind, seconds=seconds: synth.honk_clip(kind, seconds, SR))
+            cases.append(Case(f"find_horn_segment/{kind}/{seconds}s", make,
+                              lambda y: find_horn_segment(y, SR), n, "samples"))
+            cases.append(Case(f"extract_frequencies/{kind}/{seconds}s", make,
+                              lambda y: extract_frequencies(y, SR), n, "samples"))
+            cases.append(Case(f"extract_frequencies/adaptive/{kind}/{seconds}s", make,
+                              lambda y: extract_frequencies(y, SR, adaptive=True), n, "samples"))
+
+    # End-to-end file analysis (decode + segment + extract)
+    def make_files(n_files=8, seconds=3):
+        import soundfile as sf
+        paths = []
+        for i in range(n_files):
+            kind = ("pure", "dual")[i % 2]
+            path = workdir / f"synthetic_{kind}_{i}.wav"
+            sf.write(path, synth.honk_clip(kind, seconds, 44100, f0=380 + 20 * i, seed=i), 44100)
+            paths.append(str(path))
+        return paths
+
+    def analyze_all(paths):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for p in paths:
+                analyze_file(p)
+
+    cases.append(Case("analyze_file/8x3s_wav_44k", make_files, analyze_all, 8, "files"))
+
+    # Decode + resample per backend (30 s, 48 kHz file)
+    def make_long_file():
+        import soundfile as sf
+        path = workdir / "synthetic_48k_30s.wav"
+        sf.write(path, synth.honk_clip("dual", 30, 48000), 48000)
+        return str(path)
+
+    for backend in DECODE_BACKENDS:
+        cases.append(Case(f"load_audio/{backend}/48k_30s", make_long_file,
+                          lambda path, backend=backend: load_audio(path, backend=backend),
+                          30 * 48000, "samples"))
+
+    # Dissonance kernels
+    rng = np.random.default_rng(0)
+    pairs = 10_000
+    cases.append(Case("sethares_dissonance/scalar",
+                      lambda: rng.uniform(150, 800, (pairs, 2)).tolist(),
+                      lambda fs: [sethares_dissonance(a, b) for a, b in fs], pairs, "pairs"))
+    cases.append(Case("sethares_dissonance/array",
+                      lambda: rng.uniform(150, 800, (1_000_000, 2)),
+                      lambda fs: sethares_dissonance_array(fs[:, 0], fs[:, 1]), 1_000_000, "pairs"))
+    cases.append(Case("chord_dissonance/trio",
+                      lambda: rng.uniform(150, 800, (pairs, 3)).tolist(),
+                      lambda fs: [chord_dissonance(t) for t in fs], pairs, "trios"))
+    cases.append(Case("chord_dissonance_rows/numpy",
+                      lambda: rng.uniform(150, 800, (1_000_000, 3)),
+                      trio_dissonance, 1_000_000, "trios"))
+    cases.append(Case("chord_dissonance_rows/kernel",
+                      lambda: rng.uniform(150, 800, (1_000_000, 3)),
+                      kernels.chord_dissonance_rows, 1_000_000, "trios"))
+
+    # Monte Carlo over fleets of increasing size
+    for n_cars in profile["fleet_sizes"]:
+        make = (lambda n_cars=n_cars: synth.synthetic_frequencies(n_cars))
+        # monte_carlo_analysis draws each trio with an O(n) permutation
+        n_loop = 2000 if n_cars <= 10_000 else 100
+        cases.append(Case(f"monte_carlo_analysis/{n_cars}_cars", make,
+                          lambda f, n=n_loop: monte_carlo_analysis(f, n_samples=n), n_loop, "trios"))
+        cases.append(Case(f"monte_carlo_stream/{n_cars}_cars", make,
+                          lambda f: monte_carlo_stream(f, n_samples=1_000_000), 1_000_000, "trios"))
+
+    return cases
+
+
+def time_case(case: Case, min_time: float = 0.5, max_repeats: int = 20) -> dict:
+    """Time a case (best of several runs) and measure its peak traced memory."""
+    inputs = case.setup()
+    case.run(inputs)  # warm-up: imports, JIT caches, FFT plans
+
+    best = float("inf")
+    elapsed_total = 0.0
+    repeats = 0
+    while repeats < max_repeats and (repeats == 0 or elapsed_total < min_time):
+        t0 = time.perf_counter()
+        case.run(inputs)
+        dt = time.perf_counter() - t0
+        best = min(best, dt)
+        elapsed_total += dt
+        repeats += 1
+
+    # Separate pass so tracing overhead doesn't skew the timings
+    tracemalloc.start()
+    case.run(inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": best,
+        "repeats": repeats,
+        "throughput": case.items / best,
+        "unit": f"{case.unit}/s",
+        "peak_mb": peak / 1e6,
+    }
+
+
+def decode_report(workdir: Path, n_files: int = 24, seconds: float = 3.0) -> list[dict]:
+    """
+    Speed and accuracy of each decode backend on synthetic files with known
+    fundamentals, half at 44.1 kHz and half at 48 kHz.
+
+    Accuracy is the fundamental error vs. ground truth, agreement with the
+    librosa backend's fundamental / dual-horn result, and (for resampling
+    backends) the resampled signal's SNR against librosa's soxr_hq output.
+    """
+    import soundfile as sf
+    from analyze_horn import (DECODE_BACKENDS, analysis_n_fft, extract_frequencies, find_horn_segment,
+                              load_audio)
+
+    rng = np.random.default_rng(0)
+    files = []
+    for i in range(n_files):
+        sr = (44100, 48000)[i % 2]
+        kind = ("pure", "dual")[(i // 2) % 2]
+        f0 = rng.uniform(250, 650)
+        path = workdir / f"decode_{i}_{sr}.wav"
+        sf.write(path, synth.honk_clip(kind, seconds, sr, f0=f0, seed=i), sr)
+        files.append((str(path), f0))
+
+    def analyze(y, sr):
+        start, end = find_horn_segment(y, sr)
+        # Same FFT size as analyze_file, so native-rate files get native-rate bins
+        return extract_frequencies(y[start:end], sr, analysis_n_fft(sr))
+
+    reference = {}
+    rows = []
+    for backend in DECODE_BACKENDS:
+        load_audio(files[0][0], backend=backend)  # warm-up
+        t0 = time.perf_counter()
+        loaded = [load_audio(path, backend=backend) for path, _ in files]
+        decode_s = time.perf_counter() - t0
+        results = [analyze(y, sr) for y, sr in loaded]
+
+        cents = np.array([abs(1200 * np.log2(r["fundamental_hz"] / f0)) if "fundamental_hz" in r else np.inf
+                          for r, (_, f0) in zip(results, files)])
+        if backend == "librosa":
+            reference = {"signals": [y for y, _ in loaded], "results": results}
+
+        same_f0 = np.mean([r.get("fundamental_hz") == ref.get("fundamental_hz")
+                           for r, ref in zip(results, reference["results"])])
+        same_dual = np.mean([bool(r.get("dual_horn")) == bool(ref.get("dual_horn"))
+                             for r, ref in zip(results, reference["results"])])
+        snr = np.inf if backend == "librosa" else np.nan
+        if backend not in ("librosa", "native"):
+            errs = []
+            for (y, _), ref in zip(loaded, reference["signals"]):
+                n = min(len(y), len(ref))
+                noise_power = np.mean((y[:n] - ref[:n]) ** 2)
+                errs.append(10 * np.log10(np.mean(ref[:n] ** 2) / max(noise_power, 1e-20)))
+            snr = float(np.median(errs))
+
+        rows.append({
+            "backend": backend,
+            "files_per_s": n_files / decode_s,
+            "median_cents": float(np.median(cents)),
+            "max_cents": float(cents.max()),
+            "same_f0_as_librosa": float(same_f0),
+            "same_dual_as_librosa": float(same_dual),
+            "snr_vs_librosa_db": snr,
+        })
+    return rows
+
+
+def format_rate(rate: float) -> str:
+    for scale, suffix in ((1e9, "G"), (1e6, "M"), (1e3, "k")):
+        if rate >= scale:
+            return f"{rate / scale:.2f}{suffix}"
+    return f"{rate:.2f}"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print throughput change vs. baseline; return names of regressed cases."""
+    regressions = []
+    print(f"\n{'case':<44} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, r in results.items():
+        b = baseline.get(name)
+        if b is None:
+            print(f"{name:<44} {'-':>12} {format_rate(r['throughput']):>12} {'new':>8}")
+            continue
+        change = r["throughput"] / b["throughput"] - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif change > tolerance:
+            flag = "  faster"
+        print(f"{name:<44} {format_rate(b['throughput']):>12} "
+              f"{format_rate(r['throughput']):>12} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark car horn analysis hot paths")
+    parser.add_argument("--profile", choices=PROFILES, default="quick", help="Input size profile")
+    parser.add_argument("--filter", "-k", help="Only run cases whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum timing per case (s)")
+    parser.add_argument("--save", help="Write results to this JSON baseline file")
+    parser.add_argument("--compare", help="Compare against a saved JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown treated as a regression")
+    parser.add_argument("--decode-report", action="store_true",
+                        help="Only compare decode backends for speed and accuracy")
+
+    args = parser.parse_args()
+
+    if args.decode_report:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = decode_report(Path(tmp))
+        print(f"{'backend':<10} {'files/s':>8} {'med cents':>10} {'max cents':>10} "
+              f"{'f0 = librosa':>13} {'dual = librosa':>15} {'SNR dB':>7}")
+        for r in rows:
+            print(f"{r['backend']:<10} {r['files_per_s']:>8.1f} {r['median_cents']:>10.2f} "
+                  f"{r['max_cents']:>10.2f} {r['same_f0_as_librosa']:>13.0%} "
+                  f"{r['same_dual_as_librosa']:>15.0%} {r['snr_vs_librosa_db']:>7.1f}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = build_cases(PROFILES[args.profile], Path(tmp))
+        if args.filter:
+            cases = [c for c in cases if args.filter in c.name]
+
+        results = {}
+        print(f"{'case':<44} {'throughput':>14} {'time':>10} {'peak MB':>9}")
+        for case in cases:
+            r = time_case(case, min_time=args.min_time)
+            results[case.name] = r
+            print(f"{case.name:<44} {format_rate(r['throughput']):>8} {r['unit']:<5} "
+                  f"{r['seconds'] * 1e3:>8.1f}ms {r['peak_mb']:>9.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                       "machine": platform.machine(), "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
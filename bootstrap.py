@@ -0,0 +1,170 @@
+"""
+Bootstrap confidence intervals and permutation tests for group means.
+
+Every replicate of a grouping is one row of a (B, n) integer index matrix.
+Group sums for all replicates at once come from a single np.bincount over
+(replicate, group) keys, so B = 100,000 replicates of a 157-car table take
+well under a second per grouping.
+
+- Bootstrap: stratified, so each group is resampled to its own size and
+  a replicate never loses a small group. CIs are percentile intervals.
+- Permutation test: group labels are shuffled across cars. The statistic
+  is the between-group sum of squares (for two groups, equivalent to the
+  absolute difference in means).
+
+Usage:
+    python bootstrap.py
+    python bootstrap.py --by country --by is_luxury --by is_ev -B 100000
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+def _chunks(n_replicates: int, n: int, max_cells: int = 8_000_000):
+    """Split B replicates so each (chunk, n) matrix stays around max_cells entries."""
+    step = max(1, max_cells // max(n, 1))
+    for start in range(0, n_replicates, step):
+        yield min(step, n_replicates - start)
+
+
+def group_sums(values: np.ndarray, idx: np.ndarray, codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """(B, groups) sums of values[idx] where idx[b, j] belongs to group codes[b, j] (or codes[j])."""
+    n_rep = len(idx)
+    keys = np.arange(n_rep)[:, None] * n_groups + codes
+    return np.bincount(keys.ravel(), weights=values[idx].ravel(),
+                       minlength=n_rep * n_groups).reshape(n_rep, n_groups)
+
+
+def bootstrap_means(values, groups, n_replicates: int = 100_000, seed: int = 42):
+    """
+    Stratified bootstrap of every group's mean.
+
+    Parameters:
+        values: Measurements (e.g. fundamental_hz)
+        groups: Group label per measurement
+        n_replicates: Number of bootstrap replicates B
+        seed: Random seed
+
+    Returns:
+        (names, observed means, (B, groups) replicate means)
+    """
+    values = np.asarray(values, dtype=float)
+    codes, names = pd.factorize(pd.Series(groups), sort=True)
+
+    # Sort by group so group g owns positions start[g] : start[g] + size[g]
+    order = np.argsort(codes, kind="stable")
+    values, codes = values[order], codes[order]
+    size = np.bincount(codes, minlength=len(names))
+    start = np.concatenate([[0], np.cumsum(size)[:-1]])
+
+    rng = np.random.default_rng(seed)
+    replicates = []
+    for m in _chunks(n_replicates, len(values)):
+        # Column j always draws from its own group: start + floor(u * size)
+        idx = start[codes] + (rng.random((m, len(values))) * size[codes]).astype(np.int64)
+        replicates.append(group_sums(values, idx, codes, len(names)) / size)
+
+    observed = np.bincount(codes, weights=values, minlength=len(names)) / size
+    return list(names), observed, np.concatenate(replicates)
+
+
+def percentile_ci(replicates: np.ndarray, level: float = 0.95) -> tuple[np.ndarray, np.ndarray]:
+    """Percentile interval along the replicate axis."""
+    alpha = (1 - level) / 2
+    low, high = np.quantile(replicates, [alpha, 1 - alpha], axis=0)
+    return low, high
+
+
+def permutation_pvalue(values, groups, n_permutations: int = 100_000, seed: int = 42) -> float:
+    """
+    p-value for "all groups share one mean" by shuffling group labels.
+
+    Uses the between-group sum of squares, sum_g n_g * (mean_g - mean)^2.
+    """
+    values = np.asarray(values, dtype=float)
+    codes, names = pd.factorize(pd.Series(groups), sort=True)
+    n_groups = len(names)
+    if n_groups < 2:
+        return np.nan
+    size = np.bincount(codes, minlength=n_groups)
+
+    def between_ss(sums):
+        means = sums / size
+        return (size * (means - values.mean()) ** 2).sum(axis=-1)
+
+    observed = between_ss(np.bincount(codes, weights=values, minlength=n_groups))
+
+    rng = np.random.default_rng(seed)
+    n_extreme = 0
+    identity = np.arange(len(values))
+    for m in _chunks(n_permutations, len(values)):
+        shuffled = rng.permuted(np.broadcast_to(codes, (m, len(codes))), axis=1)
+        idx = np.broadcast_to(identity, (m, len(values)))
+        stats = between_ss(group_sums(values, idx, shuffled, n_groups))
+        n_extreme += int((stats >= observed * (1 - 1e-12)).sum())
+    return (n_extreme + 1) / (n_permutations + 1)
+
+
+def group_table(df: pd.DataFrame, by: str, column: str = "fundamental_hz",
+                n_replicates: int = 100_000, level: float = 0.95, seed: int = 42,
+                boot: tuple = None) -> pd.DataFrame:
+    """
+    groupby(by)[column] mean and count with bootstrap CI columns.
+    Pass boot (the output of bootstrap_means) to reuse existing replicates.
+    """
+    data = df[[by, column]].dropna()
+    names, observed, replicates = boot or bootstrap_means(data[column], data[by], n_replicates, seed)
+    low, high = percentile_ci(replicates, level)
+    return pd.DataFrame({
+        "mean": observed,
+        "ci_low": low,
+        "ci_high": high,
+        "count": data.groupby(by)[column].count().reindex(names).to_numpy(),
+    }, index=pd.Index(names, name=by))
+
+
+def gap_ci(boot: tuple, high_group, low_group, level: float = 0.95) -> tuple[float, float, float]:
+    """Observed mean(high_group) - mean(low_group) and its CI, from bootstrap_means output."""
+    names, observed, replicates = boot
+    i, j = names.index(high_group), names.index(low_group)
+    low, high = percentile_ci(replicates[:, i] - replicates[:, j], level)
+    return float(observed[i] - observed[j]), float(low), float(high)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and permutation p-values for group means")
+    parser.add_argument("--data", default="horn_data_cleaned.csv", help="Dataset CSV")
+    parser.add_argument("--column", default="fundamental_hz", help="Measurement to compare")
+    parser.add_argument("--by", action="append", help="Grouping column (repeatable; "
+                        "default: country, make, is_luxury, is_ev)")
+    parser.add_argument("-B", "--replicates", type=int, default=100_000, help="Bootstrap / permutation replicates")
+    parser.add_argument("--level", type=float, default=0.95, help="Confidence level")
+    parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    groupings = args.by or [c for c in ("country", "make", "is_luxury", "is_ev") if c in df]
+
+    for by in groupings:
+        data = df[[by, args.column]].dropna()
+        boot = bootstrap_means(data[args.column], data[by], args.replicates, args.seed)
+        table = group_table(data, by, args.column, level=args.level, boot=boot)
+        p = permutation_pvalue(data[args.column], data[by], args.replicates, args.seed)
+
+        print("=" * 60)
+        print(f"BY {by.upper()} ({args.level:.0%} bootstrap CI, B={args.replicates:,})")
+        print("=" * 60)
+        print(table.sort_values("mean").round(0).to_string())
+
+        hi, lo = table["mean"].idxmax(), table["mean"].idxmin()
+        gap, gap_low, gap_high = gap_ci(boot, hi, lo, args.level)
+        print(f"\n  Gap {hi} - {lo}: {gap:.0f} Hz [{gap_low:.0f}, {gap_high:.0f}]")
+        print(f"  Permutation p-value (no difference between groups): {p:.4f}\n")
+
+
+if __name__ == "__main__":
+    main()
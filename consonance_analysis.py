@@ -7,11 +7,17 @@ when multiple cars honk simultaneously at an intersection.
 Based on: Sethares, W. A. (1998). Tuning, Timbre, Spectrum, Scale.
 """
 
+import argparse
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from itertools import combinations
 import matplotlib.pyplot as plt
 
+from dissonance_stats import DissonanceSummary
+# Sethares model parameters and the array form live with the compiled kernels
+from kernels import A1, A2, C1, C2, DSTAR, S1, S2, chord_dissonance_rows, sethares_dissonance_array
+
 
 def sethares_dissonance(f1, f2):
     """
@@ -32,14 +38,8 @@ def sethares_dissonance(f1, f2):
     if f1 > f2:
         f1, f2 = f2, f1
 
-    # Sethares model parameters
-    Dstar = 0.24  # Critical bandwidth scaling
-    S1, S2 = 0.0207, 18.96  # Critical bandwidth coefficients
-    A1, A2 = -3.51, -5.75  # Exponential decay rates
-    C1, C2 = 5.0, -5.0  # Amplitude coefficients
-
     # Scale by critical bandwidth at the lower frequency
-    s = Dstar / (S1 * f1 + S2)
+    s = DSTAR / (S1 * f1 + S2)
     SFdif = s * (f2 - f1)
 
     # Plomp-Levelt roughness curve (sum of two exponentials)
@@ -85,6 +85,95 @@ def monte_carlo_analysis(frequencies, n_samples=10000, seed=42):
     return np.array(results)
 
 
+def sample_trios(n, size, rng):
+    """
+    Draw `size` random index trios from range(n) without replacement
+    within each trio, in O(size) regardless of n.
+
+    Returns:
+        (size, 3) integer array
+    """
+    i = rng.integers(0, n, size)
+    j = rng.integers(0, n - 1, size)
+    k = rng.integers(0, n - 2, size)
+
+    # Shift past already-drawn indices so each trio has distinct members
+    j += j >= i
+    lo, hi = np.minimum(i, j), np.maximum(i, j)
+    k += k >= lo
+    k += k >= hi
+
+    return np.stack([i, j, k], axis=1)
+
+
+def trio_dissonance(trios):
+    """Chord dissonance for each row of a (m, 3) frequency array."""
+    return (sethares_dissonance_array(trios[:, 0], trios[:, 1]) +
+            sethares_dissonance_array(trios[:, 0], trios[:, 2]) +
+            sethares_dissonance_array(trios[:, 1], trios[:, 2]))
+
+
+def _simulate_share(frequencies, n_samples, chunk_size, seed, thresholds, parallel=True):
+    """Worker body for monte_carlo_stream: one share of the samples."""
+    rng = np.random.default_rng(seed)
+    summary = DissonanceSummary(thresholds=thresholds)
+
+    for start in range(0, n_samples, chunk_size):
+        m = min(chunk_size, n_samples - start)
+        trios = frequencies[sample_trios(len(frequencies), m, rng)]
+        summary.update(chord_dissonance_rows(trios, parallel=parallel))
+
+    return summary
+
+
+def monte_carlo_stream(frequencies, n_samples=10000, chunk_size=1_000_000,
+                       seed=42, thresholds=(), n_workers=1, threads=False):
+    """
+    Streaming version of monte_carlo_analysis for very large sample counts.
+
+    Scores are folded into a DissonanceSummary chunk by chunk, so memory is
+    bounded by chunk_size rather than n_samples. With n_workers > 1 the
+    samples are split across processes and the summaries merged.
+
+    With threads=True the shares run in threads of this process instead.
+    Trio scoring goes through kernels.chord_dissonance_rows, which releases
+    the GIL when Numba is installed, so threads use every core without
+    copying frequencies or results between processes.
+
+    Parameters:
+        frequencies: Array of horn frequencies
+        n_samples: Number of random trios to sample
+        chunk_size: Trios evaluated per vectorized chunk
+        seed: Random seed for reproducibility
+        thresholds: Scores to count "<= threshold" for (e.g. benchmarks)
+        n_workers: Number of worker processes (or threads)
+        threads: Run the workers as threads (needs Numba to scale)
+
+    Returns:
+        DissonanceSummary
+    """
+    frequencies = np.asarray(frequencies, dtype=float)
+    thresholds = tuple(thresholds)
+
+    if n_workers <= 1:
+        return _simulate_share(frequencies, n_samples, chunk_size, seed, thresholds)
+
+    seeds = np.random.SeedSequence(seed).spawn(n_workers)
+    shares = [n_samples // n_workers + (w < n_samples % n_workers) for w in range(n_workers)]
+
+    summary = DissonanceSummary(thresholds=thresholds)
+    # Each thread runs the serial kernel; the threads themselves fill the cores
+    executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor(max_workers=n_workers) as pool:
+        futures = [pool.submit(_simulate_share, frequencies, share, chunk_size, s, thresholds,
+                               not threads)
+                   for share, s in zip(shares, seeds)]
+        for f in futures:
+            summary.merge(f.result())
+
+    return summary
+
+
 def find_worst_pairings(df, n_worst=10):
     """
     Find the manufacturer pairings that produce the most dissonance.
@@ -137,12 +226,23 @@ def compute_benchmarks():
 def generate_figure(dissonance_scores, benchmarks, output_path='figures/fig5_dissonance_monte_carlo.png'):
     """
     Generate histogram of dissonance scores with benchmark lines.
+
+    `dissonance_scores` may be a raw score array or a DissonanceSummary
+    from monte_carlo_stream.
     """
     plt.style.use('seaborn-v0_8-whitegrid')
     fig, ax = plt.subplots(figsize=(10, 6))
 
     # Histogram
-    ax.hist(dissonance_scores, bins=50, color='#6a51a3', alpha=0.7, edgecolor='white')
+    if isinstance(dissonance_scores, DissonanceSummary):
+        counts, edges = dissonance_scores.coarse_histogram(bins=50)
+        ax.hist(edges[:-1], bins=edges, weights=counts, color='#6a51a3', alpha=0.7, edgecolor='white')
+        n_trios = dissonance_scores.count
+        median = dissonance_scores.median()
+    else:
+        ax.hist(dissonance_scores, bins=50, color='#6a51a3', alpha=0.7, edgecolor='white')
+        n_trios = len(dissonance_scores)
+        median = np.median(dissonance_scores)
 
     # Benchmark lines
     colors = {
@@ -158,13 +258,12 @@ def generate_figure(dissonance_scores, benchmarks, output_path='figures/fig5_dis
                       label=f'{name}: {value:.2f}')
 
     ax.set_xlabel('Dissonance Score (Sethares-Plomp-Levelt)', fontsize=12)
-    ax.set_ylabel('Count (out of 10,000 random trios)', fontsize=12)
+    ax.set_ylabel(f'Count (out of {n_trios:,} random trios)', fontsize=12)
     ax.set_title('What Happens When Three Random Cars Honk Together?',
                 fontsize=14, fontweight='bold')
     ax.legend(loc='upper right', fontsize=10)
 
     # Add median line
-    median = np.median(dissonance_scores)
     ax.axvline(median, color='#2171b5', linestyle='-', linewidth=2.5,
               label=f'Median: {median:.2f}')
 
@@ -175,8 +274,18 @@ def generate_figure(dissonance_scores, benchmarks, output_path='figures/fig5_dis
     return output_path
 
 
-def main():
-    """Run the full consonance analysis."""
+def main(n_samples=10000, streaming=False, chunk_size=1_000_000, n_workers=1, threads=False):
+    """
+    Run the full consonance analysis.
+
+    Parameters:
+        n_samples: Number of random trios in the Monte Carlo simulation
+        streaming: Use monte_carlo_stream (bounded memory, mergeable summary)
+            instead of keeping every score in memory
+        chunk_size: Trios per chunk in streaming mode
+        n_workers: Worker processes in streaming mode
+        threads: Use threads instead of processes for the streaming workers
+    """
 
     # Load data
     df = pd.read_csv('horn_data_cleaned.csv')
@@ -198,26 +307,47 @@ def main():
 
     # Monte Carlo simulation
     print("\n" + "-" * 40)
-    print("MONTE CARLO SIMULATION (10,000 random 3-car combinations)")
+    print(f"MONTE CARLO SIMULATION ({n_samples:,} random 3-car combinations)")
     print("-" * 40)
 
-    dissonance_scores = monte_carlo_analysis(frequencies, n_samples=10000)
-
-    # Statistics
-    median = np.median(dissonance_scores)
-    mean = np.mean(dissonance_scores)
-    std = np.std(dissonance_scores)
-
     major_threshold = benchmarks['Major triad (A-C#-E)']
     minor_threshold = benchmarks['Minor triad (A-C-E)']
     diminished_threshold = benchmarks['Diminished (A-C-Eb)']
     semitone_threshold = benchmarks['Semitone cluster']
 
-    pct_consonant = (dissonance_scores <= major_threshold).mean() * 100
-    pct_minor = ((dissonance_scores > major_threshold) & (dissonance_scores <= minor_threshold)).mean() * 100
-    pct_moderate = ((dissonance_scores > minor_threshold) & (dissonance_scores <= diminished_threshold)).mean() * 100
-    pct_dissonant = (dissonance_scores > diminished_threshold).mean() * 100
-    pct_terrible = (dissonance_scores > semitone_threshold).mean() * 100
+    if streaming:
+        dissonance_scores = monte_carlo_stream(
+            frequencies, n_samples=n_samples, chunk_size=chunk_size, n_workers=n_workers,
+            threads=threads,
+            thresholds=[major_threshold, minor_threshold, diminished_threshold, semitone_threshold])
+
+        # Statistics
+        median = dissonance_scores.median()
+        mean = dissonance_scores.mean
+        std = dissonance_scores.std
+
+        frac_major = dissonance_scores.fraction_below(major_threshold)
+        frac_minor = dissonance_scores.fraction_below(minor_threshold)
+        frac_diminished = dissonance_scores.fraction_below(diminished_threshold)
+        frac_semitone = dissonance_scores.fraction_below(semitone_threshold)
+    else:
+        dissonance_scores = monte_carlo_analysis(frequencies, n_samples=n_samples)
+
+        # Statistics
+        median = np.median(dissonance_scores)
+        mean = np.mean(dissonance_scores)
+        std = np.std(dissonance_scores)
+
+        frac_major = (dissonance_scores <= major_threshold).mean()
+        frac_minor = (dissonance_scores <= minor_threshold).mean()
+        frac_diminished = (dissonance_scores <= diminished_threshold).mean()
+        frac_semitone = (dissonance_scores <= semitone_threshold).mean()
+
+    pct_consonant = frac_major * 100
+    pct_minor = (frac_minor - frac_major) * 100
+    pct_moderate = (frac_diminished - frac_minor) * 100
+    pct_dissonant = (1 - frac_diminished) * 100
+    pct_terrible = (1 - frac_semitone) * 100
 
     print(f"\n  Mean dissonance: {mean:.3f}")
     print(f"  Median dissonance: {median:.3f}")
@@ -336,4 +466,16 @@ Worst pairing: {worst.iloc[0]['make1']} + {worst.iloc[0]['make2']}
 
 
 if __name__ == '__main__':
-    results = main()
+    parser = argparse.ArgumentParser(description="Consonance analysis of car horn frequencies")
+    parser.add_argument("--samples", "-n", type=int, default=10000, help="Number of random trios")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Summarize scores chunk by chunk instead of keeping them all in memory")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Trios per chunk in streaming mode")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes in streaming mode")
+    parser.add_argument("--threads", action="store_true",
+                        help="Run streaming workers as threads (GIL-free with Numba installed)")
+    args = parser.parse_args()
+
+    results = main(n_samples=args.samples, streaming=args.streaming,
+                   chunk_size=args.chunk_size, n_workers=args.workers,
+                   threads=args.threads)
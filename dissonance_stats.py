@@ -0,0 +1,142 @@
+"""
+Streaming statistics for large sets of dissonance scores.
+
+Keeps everything consonance_analysis.main() reports about the Monte Carlo
+distribution (mean, std, median, threshold percentages, histogram) without
+holding the scores themselves, so simulations can run chunk by chunk and be
+split across workers.
+
+Chord dissonance is bounded (every pair contributes at most ~0.9 on the
+Sethares curve), so quantiles come from a fine fixed-bin histogram over
+[0, upper] instead of a t-digest/KLL sketch: it is exact to within one bin
+width, trivially mergeable, and doubles as the source for the figure.
+"""
+
+import numpy as np
+
+
+class DissonanceSummary:
+    """
+    Mergeable summary of a stream of dissonance scores.
+
+    Parameters:
+        upper: Upper edge of the histogram range (values above it are
+            counted in the last bin; the exact max is still tracked)
+        n_bins: Number of fine histogram bins used for quantiles
+        thresholds: Values for which to count scores <= threshold
+    """
+
+    def __init__(self, upper=3.0, n_bins=65536, thresholds=()):
+        self.upper = float(upper)
+        self.n_bins = int(n_bins)
+        self.thresholds = np.sort(np.asarray(thresholds, dtype=float))
+
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.hist = np.zeros(self.n_bins, dtype=np.int64)
+        self.below = np.zeros(len(self.thresholds), dtype=np.int64)
+
+    @property
+    def bin_edges(self):
+        return np.linspace(0.0, self.upper, self.n_bins + 1)
+
+    def update(self, scores):
+        """Add a chunk of scores to the summary."""
+        scores = np.asarray(scores, dtype=float).ravel()
+        n = len(scores)
+        if n == 0:
+            return self
+
+        # Chan et al. parallel update for mean / variance
+        chunk_mean = scores.mean()
+        chunk_m2 = ((scores - chunk_mean) ** 2).sum()
+        self._combine_moments(n, chunk_mean, chunk_m2)
+
+        self.min = min(self.min, scores.min())
+        self.max = max(self.max, scores.max())
+
+        idx = (scores * (self.n_bins / self.upper)).astype(np.int64)
+        np.clip(idx, 0, self.n_bins - 1, out=idx)
+        self.hist += np.bincount(idx, minlength=self.n_bins)
+
+        if len(self.thresholds):
+            sorted_scores = np.sort(scores)
+            self.below += np.searchsorted(sorted_scores, self.thresholds, side='right')
+
+        return self
+
+    def merge(self, other):
+        """Fold another summary (e.g. from a worker) into this one."""
+        if (other.upper, other.n_bins) != (self.upper, self.n_bins) or \
+                not np.array_equal(other.thresholds, self.thresholds):
+            raise ValueError("Cannot merge summaries with different binning or thresholds")
+        if other.count == 0:
+            return self
+
+        self._combine_moments(other.count, other.mean, other._m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.hist += other.hist
+        self.below += other.below
+        return self
+
+    __iadd__ = merge
+
+    def _combine_moments(self, n, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self):
+        """Population standard deviation (matches np.std)."""
+        return np.sqrt(self._m2 / self.count) if self.count else np.nan
+
+    def quantile(self, q):
+        """Approximate quantile(s), accurate to one fine bin width."""
+        q = np.asarray(q, dtype=float)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+
+        cum = np.cumsum(self.hist)
+        target = q * self.count
+        b = np.searchsorted(cum, target, side='left').clip(0, self.n_bins - 1)
+        prev = np.where(b > 0, cum[b - 1], 0)
+        in_bin = self.hist[b]
+        frac = np.where(in_bin > 0, (target - prev) / np.maximum(in_bin, 1), 0.0)
+
+        width = self.upper / self.n_bins
+        value = (b + frac) * width
+        return np.clip(value, self.min, self.max)
+
+    def median(self):
+        return float(self.quantile(0.5))
+
+    def fraction_below(self, threshold):
+        """Fraction of scores <= threshold (threshold must be registered)."""
+        matches = np.flatnonzero(np.isclose(self.thresholds, threshold))
+        if len(matches) == 0:
+            raise KeyError(f"Threshold {threshold} not tracked by this summary")
+        return self.below[matches[0]] / self.count
+
+    def coarse_histogram(self, bins=50):
+        """
+        Re-bin the fine histogram onto `bins` equal bins spanning [min, max],
+        the way np.histogram / plt.hist would bin the raw scores.
+
+        Returns:
+            (counts, edges)
+        """
+        lo, hi = self.min, min(self.max, self.upper)
+        if hi <= lo:
+            hi = lo + self.upper / self.n_bins
+        edges = np.linspace(lo, hi, bins + 1)
+        fine_edges = self.bin_edges
+        centers = 0.5 * (fine_edges[:-1] + fine_edges[1:])
+        counts, _ = np.histogram(np.clip(centers, lo, hi), bins=edges, weights=self.hist)
+        return counts, edges
@@ -4,6 +4,7 @@ Download car horn audio samples from YouTube for analysis.
 Usage:
     python download_samples.py "Toyota Camry 2022"
     python download_samples.py --from-list cars.txt
+    python download_samples.py --from-list cars_mega.txt --skip-covered
 
 Requires: yt-dlp (pip install yt-dlp)
 """
@@ -13,6 +14,8 @@ import argparse
 import re
 from pathlib import Path
 
+from ingest import HornStore, car_key, match_year, unique_cars
+
 
 def sanitize_filename(name: str) -> str:
     """Convert car name to safe filename."""
@@ -58,6 +61,9 @@ def main():
     parser.add_argument("--from-list", help="Text file with car names (one per line)")
     parser.add_argument("--output-dir", "-o", default="samples", help="Output directory")
     parser.add_argument("--max-results", "-n", type=int, default=1, help="Max videos per car")
+    parser.add_argument("--skip-covered", action="store_true",
+                        help="Skip cars already in the ingest store or the output directory")
+    parser.add_argument("--store", default="horn_store.jsonl", help="Ingest store for --skip-covered")
 
     args = parser.parse_args()
 
@@ -84,6 +90,23 @@ def main():
         ]
         print("Using default car list. Specify --from-list or a query for custom cars.\n")
 
+    # The car lists overlap and spell some cars differently (Mercedes C Class / C-Class)
+    n_listed = len(cars)
+    cars = unique_cars(cars)
+    if args.skip_covered:
+        on_disk = {}
+        for p in output_dir.iterdir():
+            make, model, year = car_key(p.name)
+            on_disk.setdefault((make, model), set()).add(year)
+        cars = [car for car in cars
+                if match_year(car_key(car)[2], on_disk.get(car_key(car)[:2], ())) is None]
+        if Path(args.store).exists():
+            store = HornStore(args.store)
+            cars = [car for car in cars if not store.covered(car)]
+            store.close()
+    if len(cars) < n_listed:
+        print(f"Skipping {n_listed - len(cars)} duplicate or already covered cars\n")
+
     downloaded = []
     for car in cars:
         files = search_and_download(car, output_dir, args.max_results)
@@ -0,0 +1,270 @@
+"""
+Deduplicating ingest for horn measurement tables and car lists.
+
+The dataset has been rebuilt several times (horn_data.csv,
+horn_data_expanded.csv, horn_data_mega.csv, horn_data_cleaned.csv), and the
+car lists overlap too. Every row and every car-list line is reduced to a
+normalized (make, model, year) key:
+
+    "Mercedes-Benz C-Class 2023", "mercedes_c-class_2023.webm" and
+    "Mercedes C Class 2023" all map to ("mercedes", "cclass", "2023")
+
+A missing year (tesla_model_s.wav) matches any year of the same car.
+
+The store is an append-only JSONL log (horn_store.jsonl): one line per
+accepted row, with the row's values and the table it came from. A row
+that supersedes one under a different key (a dated row replacing a
+yearless one) also logs a {"key": ..., "removed": true} tombstone for the
+old key. Opening the store replays the log into a dict keyed by car, where
+the latest line for a key wins. A merge then costs O(new rows): each row is hashed, looked up
+and appended only if it adds a car (or, with replace=True, supersedes one).
+Rows from the same car prefer a .wav source over .webm etc.
+
+Usage:
+    python ingest.py horn_data.csv horn_data_expanded.csv horn_data_mega.csv
+    python ingest.py horn_data_cleaned.csv --replace --export horn_data_merged.csv
+    python ingest.py --check cars_mega.txt --uncovered todo.txt
+"""
+
+import argparse
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+# Alternative spellings -> canonical make, matched on the leading name tokens
+MAKE_ALIASES = {
+    ("mercedes", "benz"): "mercedes",
+    ("mercedes",): "mercedes",
+    ("benz",): "mercedes",
+    ("vw",): "volkswagen",
+    ("chevy",): "chevrolet",
+    ("land", "rover"): "land rover",
+    ("alfa", "romeo"): "alfa romeo",
+    ("aston", "martin"): "aston martin",
+}
+YEAR = re.compile(r"^(19|20)\d\d$")
+
+
+def car_key(name: str) -> tuple[str, str, str]:
+    """
+    Normalized (make, model, year) for a car name or sample filename.
+
+    The year is "" when the name has none.
+    """
+    stem = re.sub(r"\.(wav|webm|m4a|mp3|mp4|opus|ogg|flac)$", "", name.strip().lower())
+    tokens = [t for t in re.split(r"[\s_\-/.]+", stem) if t]
+
+    year = ""
+    if tokens and YEAR.match(tokens[-1]):
+        year = tokens.pop()
+
+    make = tokens[0] if tokens else ""
+    for n in (2, 1):
+        alias = MAKE_ALIASES.get(tuple(tokens[:n]))
+        if alias:
+            make, tokens = alias, tokens[n - 1:]
+            break
+
+    # Separators inside model names vary (C-Class / C Class / c_class)
+    return make, "".join(tokens[1:]), year
+
+
+def match_year(year: str, years) -> str | None:
+    """
+    Which of a car's known years a (possibly missing) year refers to, or None.
+
+    A missing year matches the latest known year; a known year matches
+    itself or a yearless entry.
+    """
+    if year in years:
+        return year
+    if not year and years:
+        return sorted(years)[-1]
+    if "" in years:
+        return ""
+    return None
+
+
+def _is_wav(filename: str) -> bool:
+    return filename.lower().endswith(".wav")
+
+
+class HornStore:
+    """
+    Hash-indexed, append-only store of one measurement row per car.
+
+    Parameters:
+        path: Store JSONL file (created if missing)
+    """
+
+    def __init__(self, path: str = "horn_store.jsonl"):
+        self.path = Path(path)
+        self.rows = {}
+        self._any_year = {}  # (make, model) -> years present
+
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # half-written last line from a crash
+                    if entry.get("removed"):
+                        self._drop(tuple(entry["key"]))
+                    else:
+                        self._put(tuple(entry["key"]), entry)
+
+        self._log = open(self.path, "a")
+        if self._log.tell() and not self.path.read_bytes().endswith(b"\n"):
+            self._log.write("\n")  # don't glue the next entry onto a torn line
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _put(self, key: tuple, entry: dict):
+        self.rows[key] = entry
+        self._any_year.setdefault(key[:2], set()).add(key[2])
+
+    def _drop(self, key: tuple):
+        if self.rows.pop(key, None) is not None:
+            self._any_year[key[:2]].discard(key[2])
+
+    def find(self, name: str):
+        """Stored entry for a car name / filename, or None. A missing year on either side matches any year."""
+        make, model, year = car_key(name)
+        year = match_year(year, self._any_year.get((make, model), ()))
+        return None if year is None else self.rows[(make, model, year)]
+
+    def covered(self, name: str) -> bool:
+        return self.find(name) is not None
+
+    def merge(self, records: list[dict], source: str = "", replace: bool = False) -> dict:
+        """
+        Add rows (dicts with at least a filename) to the store.
+
+        Parameters:
+            records: Rows to merge, e.g. df.to_dict("records")
+            source: Where the rows came from, stored with each accepted row
+            replace: Let these rows supersede stored rows for the same car
+                (e.g. a re-analysis); by default the stored row is kept
+
+        Returns:
+            Counts of added, replaced and duplicate rows
+        """
+        counts = {"added": 0, "replaced": 0, "duplicate": 0}
+        for record in records:
+            record = {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in record.items()}
+            key = car_key(record["filename"])
+            existing = self.find(record["filename"])
+            if existing is not None:
+                upgrade = _is_wav(record["filename"]) and not _is_wav(existing["row"]["filename"])
+                if not (replace or upgrade):
+                    counts["duplicate"] += 1
+                    continue
+                old_key = tuple(existing["key"])
+                self._drop(old_key)
+                if old_key != key:
+                    # Otherwise replay would bring the old row back next to the new one
+                    self._log.write(json.dumps({"key": list(old_key), "removed": True}) + "\n")
+                counts["replaced"] += 1
+            else:
+                counts["added"] += 1
+
+            entry = {"key": list(key), "source": source, "row": record}
+            self._put(key, entry)
+            self._log.write(json.dumps(entry, default=str) + "\n")
+
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        return counts
+
+    def to_frame(self):
+        """One row per car, with the source table as a column."""
+        import pandas as pd
+        return pd.DataFrame([{**e["row"], "source": e["source"]} for e in self.rows.values()])
+
+    def compact(self):
+        """Rewrite the log with one line per car."""
+        self._log.close()
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            for entry in self.rows.values():
+                f.write(json.dumps(entry, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._log = open(self.path, "a")
+
+    def close(self):
+        self._log.close()
+
+
+def read_car_list(path: str) -> list[str]:
+    """Car names from a list file (one per line, # comments)."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+def unique_cars(cars: list[str]) -> list[str]:
+    """Drop later spellings of a car already in the list, keeping order."""
+    seen = set()
+    unique = []
+    for car in cars:
+        key = car_key(car)
+        if key not in seen:
+            seen.add(key)
+            unique.append(car)
+    return unique
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge horn tables into a deduplicated store")
+    parser.add_argument("tables", nargs="*", help="CSV tables to merge, in order")
+    parser.add_argument("--store", default="horn_store.jsonl", help="Store file")
+    parser.add_argument("--replace", action="store_true",
+                        help="Rows from these tables supersede stored rows for the same car")
+    parser.add_argument("--export", help="Write the merged table to this CSV")
+    parser.add_argument("--check", help="Car list to check against the store")
+    parser.add_argument("--uncovered", help="With --check, write the cars not yet covered here")
+    parser.add_argument("--compact", action="store_true", help="Rewrite the store log, one line per car")
+
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    store = HornStore(args.store)
+    print(f"Store {args.store}: {len(store)} cars")
+
+    for table in args.tables:
+        records = pd.read_csv(table).to_dict("records")
+        counts = store.merge(records, source=Path(table).name, replace=args.replace)
+        print(f"  {table}: {len(records)} rows -> {counts['added']} added, "
+              f"{counts['replaced']} replaced, {counts['duplicate']} duplicates")
+    if args.tables:
+        print(f"Store now holds {len(store)} cars")
+
+    if args.compact:
+        store.compact()
+
+    if args.check:
+        cars = read_car_list(args.check)
+        unique = unique_cars(cars)
+        todo = [car for car in unique if not store.covered(car)]
+        print(f"\n{args.check}: {len(cars)} entries, {len(unique)} distinct cars, "
+              f"{len(unique) - len(todo)} already covered, {len(todo)} to download")
+        if args.uncovered:
+            Path(args.uncovered).write_text("".join(f"{car}\n" for car in todo))
+            print(f"Uncovered cars written to {args.uncovered}")
+
+    if args.export:
+        store.to_frame().to_csv(args.export, index=False)
+        print(f"\nMerged table saved to {args.export}")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Spatial intersection simulator: what does a pedestrian actually hear?
+
+monte_carlo_analysis in consonance_analysis.py treats every honk as equally
+loud and perfectly simultaneous. Here each scenario places N vehicles
+(horns drawn from horn_data_cleaned.csv, dual horns included) at random
+points on a street grid. Each honks once at a random onset for a random
+duration. For every listener position on a grid:
+
+- Each car is heard at amplitude ref_m / max(r, ref_m), i.e. the
+  inverse-square intensity law (-6 dB per doubling of distance) beyond
+  ref_m, full level inside it.
+- Each honk arrives r / 343 s after its onset.
+- Every pair of tones contributes its Sethares dissonance, weighted by the
+  quieter tone's amplitude (as in Sethares' amplitude-weighted model) and by
+  how long the two honks overlap at that listener within the observation
+  window.
+
+The score is that weighted dissonance averaged over the observation
+window. Scenarios are processed in chunks sized to a memory budget, with
+all listeners and tone pairs of a chunk evaluated as one array expression.
+
+Usage:
+    python intersection_sim.py
+    python intersection_sim.py --cars 12 --scenarios 20000 --blocks 3 --listeners 41 \\
+        --plot figures/fig6_listener_map.png
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from dissonance_stats import DissonanceSummary
+from kernels import pair_dissonance
+
+SPEED_OF_SOUND = 343.0  # m/s
+
+
+def street_positions(rng, shape: tuple, n_blocks: int, block_m: float) -> np.ndarray:
+    """
+    Uniform random points on a square street grid with n_blocks x n_blocks
+    blocks of side block_m (streets at every multiple of block_m).
+
+    Returns:
+        Array of shape (*shape, 2) with x, y in metres
+    """
+    extent = n_blocks * block_m
+    along = rng.uniform(0, extent, shape)
+    street = rng.integers(0, n_blocks + 1, shape) * block_m
+    vertical = rng.random(shape) < 0.5
+    x = np.where(vertical, street, along)
+    y = np.where(vertical, along, street)
+    return np.stack([x, y], axis=-1)
+
+
+def listener_grid(n_blocks: int, block_m: float, n: int) -> np.ndarray:
+    """n x n listener positions covering the street grid, as an (n*n, 2) array."""
+    axis = np.linspace(0, n_blocks * block_m, n)
+    xx, yy = np.meshgrid(axis, axis)
+    return np.stack([xx.ravel(), yy.ravel()], axis=1)
+
+
+def simulate(fundamentals, duals, listeners, n_cars=8, n_scenarios=2000,
+             n_blocks=2, block_m=100.0, window_s=3.0, duration_range=(0.3, 1.5),
+             ref_m=10.0, seed=42, memory_mb=256):
+    """
+    Run the spatial simulation.
+
+    Parameters:
+        fundamentals: Horn fundamentals to draw vehicles from (Hz)
+        duals: Matching second-horn frequencies (NaN for single horns)
+        listeners: (L, 2) listener positions in metres
+        n_cars: Vehicles honking per scenario
+        n_scenarios: Number of random scenarios
+        n_blocks, block_m: Street grid size
+        window_s: Observation window; honk onsets are uniform within it
+        duration_range: (min, max) honk duration in seconds
+        ref_m: Distance inside which a horn is heard at full level
+        seed: Random seed
+        memory_mb: Approximate budget for per-chunk temporaries
+
+    Returns:
+        dict with per-listener mean / std score arrays (L,), and a
+        DissonanceSummary over all (scenario, listener) scores
+    """
+    rng = np.random.default_rng(seed)
+    fundamentals = np.asarray(fundamentals, dtype=np.float32)
+    duals = np.asarray(duals, dtype=np.float32)
+    listeners = np.asarray(listeners, dtype=np.float32)
+    n_listeners = len(listeners)
+
+    # Two tone slots per car (fundamental, dual); absent duals get zero weight
+    tone_car = np.repeat(np.arange(n_cars), 2)
+    ti, tj = np.triu_indices(2 * n_cars, 1)
+    ci, cj = tone_car[ti], tone_car[tj]
+    n_pairs = len(ti)
+
+    # ~6 float32 (chunk, L, pairs) temporaries live at once
+    chunk = max(1, int(memory_mb * 1e6 // (6 * 4 * n_listeners * n_pairs)))
+
+    total = np.zeros(n_listeners)
+    total_sq = np.zeros(n_listeners)
+    summary = DissonanceSummary(upper=10.0)
+
+    for start in range(0, n_scenarios, chunk):
+        m = min(chunk, n_scenarios - start)
+
+        idx = rng.integers(0, len(fundamentals), (m, n_cars))
+        tones = np.stack([fundamentals[idx], duals[idx]], axis=2).reshape(m, 2 * n_cars)
+        present = ~np.isnan(tones)
+        tones = np.where(present, tones, 1.0)
+
+        pos = street_positions(rng, (m, n_cars), n_blocks, block_m).astype(np.float32)
+        onset = rng.uniform(0, window_s, (m, n_cars)).astype(np.float32)
+        duration = rng.uniform(*duration_range, (m, n_cars)).astype(np.float32)
+
+        # (m, L, cars): distance, level and arrival window at each listener
+        r = np.linalg.norm(pos[:, None, :, :] - listeners[None, :, None, :], axis=-1)
+        amp = ref_m / np.maximum(r, ref_m)
+        arrive = onset[:, None, :] + r / SPEED_OF_SOUND
+        leave = arrive + duration[:, None, :]
+        # Only the part of each honk heard inside the window counts
+        np.clip(arrive, 0, window_s, out=arrive)
+        np.clip(leave, 0, window_s, out=leave)
+
+        # (m, pairs): intrinsic dissonance of each tone pair
+        pair_d = pair_dissonance(tones[:, ti], tones[:, tj]) * (present[:, ti] & present[:, tj])
+
+        # (m, L, pairs): overlap time and level weight at each listener
+        overlap = np.minimum(leave[..., ci], leave[..., cj])
+        overlap -= np.maximum(arrive[..., ci], arrive[..., cj])
+        np.maximum(overlap, 0, out=overlap)
+        overlap *= np.minimum(amp[..., ci], amp[..., cj])
+
+        score = np.einsum('mlp,mp->ml', overlap, pair_d.astype(np.float32)) / window_s
+
+        total += score.sum(axis=0)
+        total_sq += (score.astype(np.float64) ** 2).sum(axis=0)
+        summary.update(score)
+
+    mean = total / n_scenarios
+    return {
+        "mean": mean,
+        "std": np.sqrt(np.maximum(total_sq / n_scenarios - mean ** 2, 0)),
+        "summary": summary,
+        "chunk_scenarios": chunk,
+    }
+
+
+def plot_listener_map(mean, n_listeners_axis, n_blocks, block_m, output_path):
+    """Heat map of mean dissonance per listener position, with streets overlaid."""
+    import matplotlib.pyplot as plt
+
+    extent = n_blocks * block_m
+    plt.style.use('seaborn-v0_8-whitegrid')
+    fig, ax = plt.subplots(figsize=(8, 7))
+    im = ax.imshow(mean.reshape(n_listeners_axis, n_listeners_axis), origin='lower',
+                   extent=(0, extent, 0, extent), cmap='Purples')
+    for k in range(n_blocks + 1):
+        ax.axhline(k * block_m, color='#636363', linewidth=3, alpha=0.5)
+        ax.axvline(k * block_m, color='#636363', linewidth=3, alpha=0.5)
+    fig.colorbar(im, ax=ax, label='Mean amplitude-weighted dissonance')
+    ax.set_xlabel('x (m)', fontsize=12)
+    ax.set_ylabel('y (m)', fontsize=12)
+    ax.set_title('Where Is the Honking Worst?', fontsize=14, fontweight='bold')
+    ax.grid(False)
+
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
+    plt.close()
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate honk dissonance heard across a street grid")
+    parser.add_argument("--data", default="horn_data_cleaned.csv", help="Horn dataset CSV")
+    parser.add_argument("--cars", type=int, default=8, help="Vehicles honking per scenario")
+    parser.add_argument("--scenarios", type=int, default=2000, help="Number of random scenarios")
+    parser.add_argument("--blocks", type=int, default=2, help="Street grid size in blocks")
+    parser.add_argument("--block-m", type=float, default=100.0, help="Block side length (m)")
+    parser.add_argument("--listeners", type=int, default=21, help="Listener grid points per axis")
+    parser.add_argument("--window", type=float, default=3.0, help="Observation window (s)")
+    parser.add_argument("--ref-m", type=float, default=10.0, help="Full-level distance (m)")
+    parser.add_argument("--memory-mb", type=float, default=256, help="Memory budget per chunk")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--plot", help="Save a listener heat map to this path")
+
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    listeners = listener_grid(args.blocks, args.block_m, args.listeners)
+
+    result = simulate(df['fundamental_hz'].values, df['dual_horn'].values, listeners,
+                      n_cars=args.cars, n_scenarios=args.scenarios, n_blocks=args.blocks,
+                      block_m=args.block_m, window_s=args.window, ref_m=args.ref_m,
+                      seed=args.seed, memory_mb=args.memory_mb)
+
+    summary = result["summary"]
+    print("=" * 60)
+    print("SPATIAL INTERSECTION SIMULATION")
+    print("=" * 60)
+    print(f"\n{args.scenarios:,} scenarios x {len(listeners)} listeners, {args.cars} cars each "
+          f"({result['chunk_scenarios']} scenarios per chunk)")
+    print(f"Street grid: {args.blocks}x{args.blocks} blocks of {args.block_m:.0f} m")
+    print(f"\n  Mean dissonance: {summary.mean:.3f}")
+    print(f"  Median dissonance: {summary.median():.3f}")
+    print(f"  95th percentile: {float(summary.quantile(0.95)):.3f}")
+
+    worst = np.argmax(result["mean"])
+    best = np.argmin(result["mean"])
+    print(f"\n  Worst listener spot: ({listeners[worst, 0]:.0f} m, {listeners[worst, 1]:.0f} m), "
+          f"mean {result['mean'][worst]:.3f}")
+    print(f"  Quietest listener spot: ({listeners[best, 0]:.0f} m, {listeners[best, 1]:.0f} m), "
+          f"mean {result['mean'][best]:.3f}")
+
+    if args.plot:
+        path = plot_listener_map(result["mean"], args.listeners, args.blocks, args.block_m, args.plot)
+        print(f"\n  Saved heat map to: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Compiled hot kernels: Sethares dissonance and RMS segment detection.
+
+Also home to the Sethares model parameters and sethares_dissonance_array
+(re-exported by consonance_analysis), so the analysis scripts can import
+this module without pulling in pandas or matplotlib.
+
+With Numba installed these are machine-code loops compiled with nogil=True,
+in a parallel (prange) and a serial flavour. They evaluate straight from
+the input arrays without the (m, pairs) or (frame_length, frames)
+temporaries the NumPy versions build, and release the GIL, so threads can
+share one process's memory and still use every core:
+
+- parallel=True: one call spreads its rows over all cores
+- parallel=False: for code that is already running one call per thread
+
+Without Numba every function falls back to the equivalent NumPy code, so
+callers never need to check HAVE_NUMBA.
+"""
+
+import types
+
+import numpy as np
+
+try:
+    import numba
+    from numba import prange
+except ImportError:
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+# Sethares model parameters
+DSTAR = 0.24  # Critical bandwidth scaling
+S1, S2 = 0.0207, 18.96  # Critical bandwidth coefficients
+A1, A2 = -3.51, -5.75  # Exponential decay rates
+C1, C2 = 5.0, -5.0  # Amplitude coefficients
+
+
+def sethares_dissonance_array(f1, f2):
+    """
+    Vectorized Sethares dissonance (see consonance_analysis.sethares_dissonance)
+    over arrays of frequency pairs.
+
+    Parameters:
+        f1, f2: Broadcastable arrays of frequencies in Hz
+
+    Returns:
+        Array of dissonance scores
+    """
+    lo = np.minimum(f1, f2)
+    hi = np.maximum(f1, f2)
+
+    SFdif = DSTAR / (S1 * lo + S2) * (hi - lo)
+    d = C1 * np.exp(A1 * SFdif) + C2 * np.exp(A2 * SFdif)
+
+    return np.maximum(d, 0)
+
+
+if HAVE_NUMBA:
+    @numba.njit(nogil=True, inline="always")
+    def _pair(f1, f2):
+        lo, hi = min(f1, f2), max(f1, f2)
+        x = DSTAR / (S1 * lo + S2) * (hi - lo)
+        d = C1 * np.exp(A1 * x) + C2 * np.exp(A2 * x)
+        return d if d > 0 else 0.0
+
+    def _pair_loop(f1, f2, out):
+        for i in prange(f1.shape[0]):
+            out[i] = _pair(f1[i], f2[i])
+
+    def _chord_loop(chords, out):
+        m, k = chords.shape
+        for r in prange(m):
+            total = 0.0
+            for i in range(k):
+                a = chords[r, i]
+                if np.isnan(a):
+                    continue
+                for j in range(i + 1, k):
+                    b = chords[r, j]
+                    if not np.isnan(b):
+                        total += _pair(a, b)
+            out[r] = total
+
+    def _rms_loop(y, frame_length, hop_length, out):
+        # librosa.feature.rms framing: centred frames over zero padding
+        half = frame_length // 2
+        for t in prange(out.shape[0]):
+            lo = max(0, t * hop_length - half)
+            hi = min(y.shape[0], t * hop_length + half)
+            total = 0.0
+            for i in range(lo, hi):
+                total += y[i] * y[i]
+            out[t] = np.sqrt(total / frame_length)
+
+    @numba.njit(nogil=True, cache=True)
+    def _first_run_loop(values, threshold):
+        # Sequential scan that stops at the end of the first run
+        n = values.shape[0]
+        i = 0
+        while i < n and not values[i] > threshold:
+            i += 1
+        if i == n:
+            return -1, -1
+        start = max(i - 1, 0)
+        while i + 1 < n and values[i + 1] > threshold:
+            i += 1
+        return start, i
+
+    def _compile(func):
+        # Numba's on-disk cache is keyed by qualified name, not by the parallel
+        # option, so the parallel flavour compiles from a renamed copy;
+        # otherwise whichever flavour ran first would be loaded for both
+        copy = types.FunctionType(func.__code__, func.__globals__, func.__name__ + "_parallel",
+                                  func.__defaults__, func.__closure__)
+        copy.__qualname__ = func.__qualname__ + "_parallel"
+        return (numba.njit(nogil=True, cache=True)(func),
+                numba.njit(nogil=True, cache=True, parallel=True)(copy))
+
+    _PAIR = _compile(_pair_loop)
+    _CHORD = _compile(_chord_loop)
+    _RMS = _compile(_rms_loop)
+
+
+def pair_dissonance(f1, f2, parallel: bool = True) -> np.ndarray:
+    """sethares_dissonance_array over broadcastable arrays of frequency pairs."""
+    f1, f2 = np.broadcast_arrays(np.asarray(f1, dtype=float), np.asarray(f2, dtype=float))
+    if not HAVE_NUMBA:
+        return sethares_dissonance_array(f1, f2)
+    out = np.empty(f1.shape)
+    _PAIR[parallel](np.ascontiguousarray(f1).reshape(-1), np.ascontiguousarray(f2).reshape(-1),
+                    out.reshape(-1))
+    return out
+
+
+def chord_dissonance_rows(chords, parallel: bool = True) -> np.ndarray:
+    """
+    Summed pairwise dissonance of each row of a (m, k) frequency array,
+    e.g. trios from the Monte Carlo. NaN entries (fewer than k tones) are
+    skipped.
+    """
+    chords = np.ascontiguousarray(chords, dtype=float)
+    if HAVE_NUMBA:
+        out = np.empty(len(chords))
+        _CHORD[parallel](chords, out)
+        return out
+
+    total = np.zeros(len(chords))
+    for i in range(chords.shape[1]):
+        for j in range(i + 1, chords.shape[1]):
+            d = sethares_dissonance_array(np.nan_to_num(chords[:, i], nan=1.0),
+                                          np.nan_to_num(chords[:, j], nan=1.0))
+            total += np.where(np.isnan(chords[:, i]) | np.isnan(chords[:, j]), 0.0, d)
+    return total
+
+
+def frame_rms(y: np.ndarray, frame_length: int = 2048, hop_length: int = 512,
+              parallel: bool = True) -> np.ndarray:
+    """librosa.feature.rms(y=y)[0] (centred, zero-padded frames)."""
+    if not HAVE_NUMBA:
+        import librosa
+        return librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
+    out = np.empty(1 + len(y) // hop_length, dtype=np.float32)
+    _RMS[parallel](np.ascontiguousarray(y), frame_length, hop_length, out)
+    return out
+
+
+def first_run_above(values: np.ndarray, threshold: float) -> tuple[int, int]:
+    """
+    First run of values > threshold, as find_horn_segment reports it: (the
+    index just before the run, or 0 if it starts at 0; the run's last
+    index). (-1, -1) if nothing is above the threshold.
+    """
+    if HAVE_NUMBA:
+        return _first_run_loop(np.ascontiguousarray(values), threshold)
+
+    hits = np.flatnonzero(values > threshold)
+    if len(hits) == 0:
+        return -1, -1
+    gaps = np.flatnonzero(np.diff(hits) > 1)
+    end = hits[gaps[0]] if len(gaps) else hits[-1]
+    return int(max(hits[0] - 1, 0)), int(end)
@@ -0,0 +1,246 @@
+"""
+Real-time car horn detector.
+
+Reads PCM audio from stdin (WAV or raw 16-bit little-endian) or a
+microphone, gates it on RMS level, and runs a short sliding FFT over a
+ring buffer while the gate is open. Each FFT reuses the peak picking from
+analyze_horn.extract_frequencies. Events are printed as JSON lines:
+
+    {"event": "honk_start", "t": 1.02, "fundamental_hz": 440.4, "note": "A4 (+1 cents)", ...}
+    {"event": "note_change", ...}
+    {"event": "honk_end", "t": 2.40, "duration_s": 1.38}
+
+Events are held until a full window of audio has arrived since onset, so
+latency is roughly one window plus one hop (~80 ms with the defaults).
+
+Usage:
+    cat horn.wav | python live_honk.py -
+    arecord -f S16_LE -r 44100 -c 1 | python live_honk.py - --raw --rate 44100
+    python live_honk.py --mic                # requires sounddevice
+"""
+
+import argparse
+import json
+import sys
+import wave
+
+import numpy as np
+
+from analyze_horn import pick_peaks
+
+# Window size extract_frequencies uses at 22050 Hz; spectra are zero-padded
+# to the same bin spacing so pick_peaks' distance/prominence mean the same.
+REFERENCE_N_FFT = 4096
+REFERENCE_SR = 22050
+
+
+class HonkDetector:
+    """
+    Incremental RMS gate + sliding FFT honk detector.
+
+    Parameters:
+        sr: Sample rate of the incoming audio
+        window_s: FFT window length in seconds
+        hop_s: Hop between FFTs (and RMS gate updates) in seconds
+        threshold_db: RMS level that opens the gate (as in find_horn_segment)
+        release_db: Gate closes when level drops this far below threshold
+        smoothing: Weight of the newest spectrum in the running average
+    """
+
+    def __init__(self, sr: int, window_s: float = 0.06, hop_s: float = 0.02,
+                 threshold_db: float = -20, release_db: float = 6, smoothing: float = 0.3):
+        self.sr = sr
+        self.hop = max(1, int(hop_s * sr))
+        self.window_len = max(self.hop, int(window_s * sr))
+        self.threshold_db = threshold_db
+        self.release_db = release_db
+        self.smoothing = smoothing
+
+        # Zero-pad to the reference bin spacing (~5.4 Hz)
+        target = REFERENCE_N_FFT * sr / REFERENCE_SR
+        self.n_fft = int(2 ** np.ceil(np.log2(max(target, self.window_len))))
+        self.freqs = np.fft.rfftfreq(self.n_fft, 1 / sr)
+        self.window = np.hanning(self.window_len).astype(np.float32)
+        # Match the magnitude scale of a full 4096-sample librosa STFT frame
+        self.scale = REFERENCE_N_FFT / self.window_len
+
+        self.ring = np.zeros(self.window_len, dtype=np.float32)
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.samples_seen = 0
+
+        self.active = False
+        self.onset_t = None
+        self.onset_sample = 0
+        self.avg_spectrum = None
+        self.current_note = None
+
+    @property
+    def latency_s(self) -> float:
+        return (self.hop + self.window_len) / self.sr
+
+    def process(self, block: np.ndarray) -> list[dict]:
+        """Feed a block of mono float samples; return any events it triggers."""
+        events = []
+        self.pending = np.concatenate([self.pending, np.asarray(block, dtype=np.float32)])
+
+        while len(self.pending) >= self.hop:
+            hop_samples, self.pending = self.pending[:self.hop], self.pending[self.hop:]
+            self.samples_seen += self.hop
+
+            # Slide the ring buffer by one hop
+            self.ring = np.roll(self.ring, -self.hop)
+            self.ring[-self.hop:] = hop_samples[-self.window_len:]
+
+            event = self._step(hop_samples)
+            if event:
+                events.append(event)
+
+        return events
+
+    def flush(self) -> list[dict]:
+        """Close any open honk at end of stream."""
+        if not self.active:
+            return []
+        return [self._close()]
+
+    def _step(self, hop_samples: np.ndarray):
+        t = self.samples_seen / self.sr
+        rms = np.sqrt(np.mean(hop_samples.astype(np.float64) ** 2))
+        level_db = 20 * np.log10(max(rms, 1e-10))
+
+        if not self.active:
+            if level_db <= self.threshold_db:
+                return None
+            self.active = True
+            self.onset_sample = self.samples_seen - self.hop
+            self.onset_t = self.onset_sample / self.sr
+            self.avg_spectrum = None
+            self.current_note = None
+        elif level_db < self.threshold_db - self.release_db:
+            return self._close()
+
+        # Until the ring holds a full window of the honk, its spectrum is
+        # mostly lead-in and the pitch would be wrong
+        if self.samples_seen - self.onset_sample < self.window_len:
+            return None
+
+        spectrum = np.abs(np.fft.rfft(self.ring * self.window, n=self.n_fft)) * self.scale
+        if self.avg_spectrum is None:
+            self.avg_spectrum = spectrum
+        else:
+            self.avg_spectrum += self.smoothing * (spectrum - self.avg_spectrum)
+
+        results = pick_peaks(self.freqs, self.avg_spectrum)
+        if "error" in results:
+            return None
+
+        note = results["fundamental_note"].split(" ")[0]
+        if note == self.current_note:
+            return None
+
+        event = {
+            "event": "honk_start" if self.current_note is None else "note_change",
+            "t": round(t, 3),
+            "onset_t": round(self.onset_t, 3),
+            "fundamental_hz": round(results["fundamental_hz"], 1),
+            "note": results["fundamental_note"],
+            "dual_horn_hz": round(float(results["dual_horn"]["frequency"]), 1) if results["dual_horn"] else None,
+            "interval": results["dual_horn"]["interval"] if results["dual_horn"] else None,
+        }
+        self.current_note = note
+        return event
+
+    def _close(self) -> dict:
+        t = self.samples_seen / self.sr
+        self.active = False
+        return {"event": "honk_end", "t": round(t, 3), "duration_s": round(t - self.onset_t, 3)}
+
+
+def read_stdin_blocks(stream, raw: bool, rate: int, channels: int, block_frames: int):
+    """Yield (sr, mono float32 block) from a WAV or raw s16le byte stream."""
+    if raw:
+        sr, width = rate, 2
+        read = stream.read
+    else:
+        wav = wave.open(stream, "rb")
+        sr, width, channels = wav.getframerate(), wav.getsampwidth(), wav.getnchannels()
+        if width not in (1, 2, 4):
+            raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+        read = lambda n: wav.readframes(n // (width * channels))
+
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+    full_scale = float(2 ** (8 * width - 1))
+    frame_bytes = width * channels
+
+    leftover = b""
+    while True:
+        data = read(block_frames * frame_bytes)
+        if not data:
+            break
+        data = leftover + data
+        usable = len(data) - len(data) % frame_bytes
+        data, leftover = data[:usable], data[usable:]
+
+        samples = np.frombuffer(data, dtype=dtype).astype(np.float32)
+        if width == 1:
+            samples -= 128
+        samples /= full_scale
+        yield sr, samples.reshape(-1, channels).mean(axis=1)
+
+
+def read_mic_blocks(rate: int, channels: int, block_frames: int):
+    """Yield (sr, mono float32 block) from the default input device."""
+    try:
+        import sounddevice as sd
+    except ImportError:
+        print("Install sounddevice for microphone input: pip install sounddevice")
+        sys.exit(1)
+
+    with sd.InputStream(samplerate=rate, channels=channels, dtype="float32",
+                        blocksize=block_frames) as stream:
+        while True:
+            block, _ = stream.read(block_frames)
+            yield rate, block.mean(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect car horns in a live audio stream")
+    parser.add_argument("input", nargs="?", default="-", help="'-' to read from stdin")
+    parser.add_argument("--mic", action="store_true", help="Read from the default microphone")
+    parser.add_argument("--raw", action="store_true", help="stdin is raw s16le PCM, not WAV")
+    parser.add_argument("--rate", type=int, default=44100, help="Sample rate for --raw / --mic")
+    parser.add_argument("--channels", type=int, default=1, help="Channels for --raw / --mic")
+    parser.add_argument("--window", type=float, default=0.06, help="FFT window (s)")
+    parser.add_argument("--hop", type=float, default=0.02, help="Hop between FFTs (s)")
+    parser.add_argument("--threshold-db", type=float, default=-20, help="RMS gate level (dB)")
+
+    args = parser.parse_args()
+
+    if args.mic:
+        blocks = read_mic_blocks(args.rate, args.channels, int(args.hop * args.rate))
+    elif args.input == "-":
+        blocks = read_stdin_blocks(sys.stdin.buffer, args.raw, args.rate, args.channels,
+                                   int(args.hop * args.rate))
+    else:
+        parser.error("input must be '-' (stdin) or use --mic")
+
+    detector = None
+    try:
+        for sr, block in blocks:
+            if detector is None:
+                detector = HonkDetector(sr, window_s=args.window, hop_s=args.hop,
+                                        threshold_db=args.threshold_db)
+                print(f"# sr={sr} window={detector.window_len} n_fft={detector.n_fft} "
+                      f"latency~{detector.latency_s * 1e3:.0f}ms", file=sys.stderr)
+            for event in detector.process(block):
+                print(json.dumps(event), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+    if detector is not None:
+        for event in detector.flush():
+            print(json.dumps(event), flush=True)
+
+
+if __name__ == "__main__":
+    main()
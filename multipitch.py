@@ -0,0 +1,291 @@
+"""
+Multi-horn pitch estimation for recordings where several cars overlap.
+
+extract_frequencies reports one fundamental (plus at most a dual-horn
+partner) per clip. Here the recording is cut into fixed windows, and each
+window gets the set of horn fundamentals sounding in it:
+
+1. The window's frames are Hann-windowed and FFT'd in one batched rfft,
+   then averaged into one magnitude spectrum per window, like
+   average_spectrum but at the file's native rate.
+2. Every candidate f0 on a log grid (10 cent steps over the horn range) is
+   scored by a harmonic sum: sum over h of spectrum(h * f0) / h.
+3. The best candidate is accepted if its fundamental stands clear of the
+   surrounding noise floor (traffic rumble is far from white, so the floor
+   is measured locally) and its salience is a fair share of the first
+   horn's. Its harmonics are then cancelled from the spectrum, and the
+   search repeats for up to max_horns pitches.
+4. A dual-horn car sounds two fundamentals a third apart. Pitches whose
+   ratio falls in the dual-horn range of extract_frequencies are folded
+   into one horn (the stronger pitch, with the other as its dual), so
+   they count once and their own third is not scored as dissonance. Two
+   separate cars a third apart are folded the same way.
+
+All of this runs as array operations over every window of a block, and
+blocks are streamed from disk, so hour-long field recordings run in
+bounded memory at many times real time.
+
+Usage:
+    python multipitch.py field_recording.wav
+    python multipitch.py field_recording.flac --window 0.5 --max-horns 4 \\
+        --output windows.csv --dissonance
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import maximum_filter1d
+
+from analyze_horn import PEAK_DEFAULTS, analysis_n_fft
+from dissonance_stats import DissonanceSummary
+from kernels import chord_dissonance_rows
+
+N_HARMONICS = 6
+CANCEL_BINS = 2  # bins either side of each harmonic removed on cancellation
+FLOOR_BINS = 20  # bins either side of a fundamental used to estimate the local noise floor
+
+
+def iter_blocks(path: str, block_s: float = 60.0):
+    """Yield (mono float32 block, sample rate), reading block_s seconds at a time."""
+    import soundfile as sf
+    try:
+        with sf.SoundFile(path) as f:
+            for block in f.blocks(blocksize=int(block_s * f.samplerate), dtype="float32", always_2d=True):
+                yield block.mean(axis=1), f.samplerate
+        return
+    except sf.LibsndfileError:
+        pass
+    # Formats libsndfile can't read (m4a, webm, ...) are decoded whole
+    import librosa
+    y, sr = librosa.load(path, sr=None)
+    step = int(block_s * sr)
+    for start in range(0, len(y), step):
+        yield y[start:start + step], sr
+
+
+class MultiPitch:
+    """
+    Harmonic-sum multi-pitch estimator for a fixed sample rate.
+
+    Parameters:
+        sr: Sample rate of the audio
+        window_s: Length of each analysis window (s)
+        hop: STFT hop in samples (default n_fft // 4)
+        f_min, f_max: Fundamental search range (Hz)
+        max_horns: Max concurrent pitches searched per window (a dual horn uses two)
+        rel_salience: A further horn needs this fraction of the first horn's salience
+        min_peak_db: A horn's fundamental must be this far above the local noise floor
+        silence_db: Windows quieter than this RMS (dBFS) report no horns
+        dual_min, dual_max: Ratio range in which two pitches are one dual horn
+    """
+
+    def __init__(self, sr: int, window_s: float = 0.5, hop: int = None,
+                 f_min: float = PEAK_DEFAULTS["horn_min"], f_max: float = PEAK_DEFAULTS["horn_max"],
+                 max_horns: int = 4, rel_salience: float = 0.15, min_peak_db: float = 15.0,
+                 silence_db: float = -40.0, dual_min: float = PEAK_DEFAULTS["dual_min"],
+                 dual_max: float = PEAK_DEFAULTS["dual_max"]):
+        self.sr = sr
+        self.n_fft = analysis_n_fft(sr)
+        self.hop = hop or self.n_fft // 4
+        self.window = int(round(window_s * sr))
+        if self.window < self.n_fft:
+            raise ValueError(f"window_s must be at least {self.n_fft / sr:.3f}s (one FFT frame)")
+        self.max_horns = max_horns
+        self.rel_salience = rel_salience
+        self.min_peak_db = min_peak_db
+        self.silence_db = silence_db
+        self.dual_min = dual_min
+        self.dual_max = dual_max
+
+        self.hann = np.hanning(self.n_fft).astype(np.float32)
+        bin_hz = sr / self.n_fft
+        n_bins = self.n_fft // 2 + 1
+        self.candidates = f_min * 2 ** (np.arange(0, 1200 * np.log2(f_max / f_min) + 1, 10) / 1200)
+
+        # (candidates, harmonics) bin of each harmonic; out-of-range harmonics
+        # point at a sentinel zero column appended to the spectrum
+        h = np.arange(1, N_HARMONICS + 1)
+        bins = np.round(self.candidates[:, None] * h / bin_hz).astype(np.int64)
+        self.harmonic_bins = np.where(bins < n_bins, bins, n_bins)
+        self.weights = (1.0 / h).astype(np.float32)
+
+    def spectra(self, y: np.ndarray) -> np.ndarray:
+        """(windows, bins) average magnitude spectra of consecutive full windows of y."""
+        n_windows = len(y) // self.window
+        windows = y[:n_windows * self.window].reshape(n_windows, self.window)
+        frames = np.lib.stride_tricks.sliding_window_view(windows, self.n_fft, axis=1)[:, ::self.hop]
+        return np.abs(np.fft.rfft(frames * self.hann, axis=-1)).mean(axis=1)
+
+    def estimate(self, y: np.ndarray) -> dict:
+        """
+        Estimate concurrent fundamentals in each full window of y.
+
+        Returns:
+            dict of (windows, max_horns) arrays, strongest horn first:
+                f0_hz: Fundamentals (NaN where fewer horns were found)
+                dual_hz: Each horn's dual-horn partner (NaN for single horns)
+                salience: Harmonic-sum salience of each horn's fundamental
+            and n_horns, a (windows,) count
+        """
+        spec = self.spectra(y)
+        n_windows = len(spec)
+        rows = np.arange(n_windows)[:, None]
+        spec = np.concatenate([spec, np.zeros((n_windows, 1), spec.dtype)], axis=1)
+
+        with np.errstate(divide="ignore"):
+            rms_db = 10 * np.log10(np.mean(y[:n_windows * self.window].reshape(n_windows, -1) ** 2, axis=1))
+        active = rms_db > self.silence_db
+
+        f0 = np.full((n_windows, self.max_horns), np.nan)
+        salience = np.zeros((n_windows, self.max_horns), dtype=np.float32)
+        offsets = np.arange(-CANCEL_BINS, CANCEL_BINS + 1)
+        around = np.arange(-FLOOR_BINS, FLOOR_BINS + 1)
+
+        for k in range(self.max_horns):
+            # Tolerate a bin of detuning between the grid and the actual partials
+            smooth = maximum_filter1d(spec, size=3, axis=1)
+            sal = smooth[:, self.harmonic_bins] @ self.weights
+            best = sal.argmax(axis=1)
+            best_sal = sal[np.arange(n_windows), best]
+
+            fundamental_bin = self.harmonic_bins[best, 0]
+            fundamental = smooth[np.arange(n_windows), fundamental_bin]
+            # Clamped so a low f_min can't wrap around to the top of the spectrum (or use DC)
+            floor_bins = (fundamental_bin[:, None] + around).clip(1, spec.shape[1] - 2)
+            floor = np.median(spec[rows, floor_bins], axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                clear = 20 * np.log10(fundamental / floor) > self.min_peak_db
+            strong = best_sal >= self.rel_salience * (salience[:, 0] if k else best_sal)
+            active &= clear & strong
+
+            f0[active, k] = self.candidates[best[active]]
+            salience[active, k] = best_sal[active]
+
+            # Cancel the accepted horn's partials before looking for the next one
+            cancel = (self.harmonic_bins[best][:, :, None] + offsets).reshape(n_windows, -1)
+            cancel = cancel.clip(0, spec.shape[1] - 1)
+            spec[rows, cancel] = np.where(active[:, None], 0, spec[rows, cancel])
+            spec[:, -1] = 0
+
+        f0, dual, salience = self.fold_duals(f0, salience)
+        return {"f0_hz": f0, "dual_hz": dual, "salience": salience, "n_horns": (~np.isnan(f0)).sum(axis=1)}
+
+    def fold_duals(self, f0: np.ndarray, salience: np.ndarray):
+        """
+        Fold each pitch a dual-horn ratio away from a stronger, still unpaired
+        pitch into that horn.
+
+        Returns:
+            (f0, dual, salience) arrays shaped like f0, with the remaining
+            horns moved to the front in their original order
+        """
+        f0, salience = f0.copy(), salience.copy()
+        dual = np.full_like(f0, np.nan)
+        for k in range(1, f0.shape[1]):
+            for j in range(k):
+                with np.errstate(invalid="ignore"):
+                    ratio = np.fmax(f0[:, j], f0[:, k]) / np.fmin(f0[:, j], f0[:, k])
+                    pair = (ratio > self.dual_min) & (ratio < self.dual_max) & np.isnan(dual[:, j])
+                dual[pair, j] = f0[pair, k]
+                f0[pair, k] = np.nan
+                salience[pair, k] = 0
+
+        order = np.argsort(np.isnan(f0), axis=1, kind="stable")
+        return (np.take_along_axis(f0, order, axis=1), np.take_along_axis(dual, order, axis=1),
+                np.take_along_axis(salience, order, axis=1))
+
+
+def window_dissonance(f0: np.ndarray) -> np.ndarray:
+    """
+    Summed pairwise Sethares dissonance of each window's horn fundamentals
+    (NaN-padded rows). Dual horns are already folded, so a car's own third
+    does not count.
+    """
+    return chord_dissonance_rows(f0)
+
+
+def analyze_recording(path: str, window_s: float = 0.5, block_s: float = 60.0,
+                      dissonance: bool = False, **params) -> pd.DataFrame:
+    """
+    Stream a recording block by block and estimate horns per window.
+
+    Returns:
+        DataFrame with one row per window: start_s, n_horns, f0_1..f0_k,
+        dual_1..dual_k, and dissonance if requested
+    """
+    estimator = None
+    parts = []
+    offset = 0
+    carry = np.zeros(0, dtype=np.float32)
+
+    for block, sr in iter_blocks(path, block_s):
+        if estimator is None:
+            estimator = MultiPitch(sr, window_s=window_s, **params)
+        y = np.concatenate([carry, block])
+        n_full = len(y) // estimator.window * estimator.window
+        carry = y[n_full:]
+        if n_full == 0:
+            continue
+
+        est = estimator.estimate(y[:n_full])
+        part = pd.DataFrame(est["f0_hz"], columns=[f"f0_{k + 1}" for k in range(estimator.max_horns)])
+        part[[f"dual_{k + 1}" for k in range(estimator.max_horns)]] = est["dual_hz"]
+        part.insert(0, "n_horns", est["n_horns"])
+        part.insert(0, "start_s", (offset + np.arange(len(part)) * estimator.window) / sr)
+        if dissonance:
+            part["dissonance"] = window_dissonance(est["f0_hz"])
+        parts.append(part)
+        offset += n_full
+
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate concurrent horn fundamentals in a long recording")
+    parser.add_argument("path", help="Audio file (any length)")
+    parser.add_argument("--window", type=float, default=0.5, help="Analysis window (s)")
+    parser.add_argument("--max-horns", type=int, default=4, help="Max concurrent horns per window")
+    parser.add_argument("--rel-salience", type=float, default=0.15,
+                        help="Salience of a further horn relative to the strongest")
+    parser.add_argument("--min-peak-db", type=float, default=15.0,
+                        help="Fundamental level above the local noise floor (dB)")
+    parser.add_argument("--silence-db", type=float, default=-40.0, help="Skip windows quieter than this (dBFS)")
+    parser.add_argument("--output", "-o", help="Write per-window results to this CSV")
+    parser.add_argument("--dissonance", action="store_true",
+                        help="Score each window's Sethares dissonance")
+
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    table = analyze_recording(args.path, window_s=args.window, dissonance=args.dissonance,
+                              max_horns=args.max_horns, rel_salience=args.rel_salience,
+                              min_peak_db=args.min_peak_db, silence_db=args.silence_db)
+    elapsed = time.perf_counter() - t0
+
+    if table.empty:
+        print("Recording is shorter than one analysis window")
+        return
+
+    duration = len(table) * args.window
+    print(f"Analyzed {duration / 60:.1f} min in {elapsed:.1f}s ({duration / elapsed:.0f}x real time)")
+    counts = table["n_horns"].value_counts().sort_index()
+    for n, count in counts.items():
+        print(f"  {n} horn(s): {count:6d} windows ({count / len(table):.1%})")
+
+    if args.dissonance:
+        overlapping = table.loc[table["n_horns"] >= 2, "dissonance"].to_numpy()
+        if len(overlapping):
+            summary = DissonanceSummary(upper=10.0)
+            summary.update(overlapping)
+            print(f"\n  Dissonance while horns overlap: mean {summary.mean:.3f}, "
+                  f"median {summary.median():.3f}, 95th percentile {float(summary.quantile(0.95)):.3f}")
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"\nPer-window results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Frequency to musical note conversion (12-TET, A4 = 440 Hz).
+
+freq_to_note_array converts a whole frequency column in one NumPy pass to
+structured note index / octave / cents arrays; strings are only built when
+format_notes is called at output time.
+
+Usage:
+    notes = freq_to_note_array(df['fundamental_hz'])
+    np.bincount(notes['note'][notes['note'] >= 0], minlength=12)   # note histogram
+    df['fundamental_note'] = format_notes(notes)
+"""
+
+import numpy as np
+
+NOTE_NAMES = np.array(['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'])
+
+
+def freq_to_note_array(freqs) -> dict:
+    """
+    Convert frequencies to nearest equal-tempered notes.
+
+    Parameters:
+        freqs: Array-like of frequencies in Hz (<= 0 or NaN means no note)
+
+    Returns:
+        dict of arrays:
+            note: Pitch class index into NOTE_NAMES (0 = C), -1 if invalid
+            octave: Scientific pitch octave (A4 = 440 Hz)
+            cents: Deviation from the nearest note in cents, [-50, 50]
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    valid = freqs > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        semitones_from_a4 = 12 * np.log2(np.where(valid, freqs, 440.0) / 440)
+    nearest = np.round(semitones_from_a4)
+    semitone_idx = nearest.astype(np.int64) + 9  # A is 9 semitones from C
+
+    return {
+        'note': np.where(valid, semitone_idx % 12, -1).astype(np.int8),
+        'octave': np.where(valid, 4 + semitone_idx // 12, 0).astype(np.int16),
+        'cents': np.where(valid, (semitones_from_a4 - nearest) * 100, np.nan),
+    }
+
+
+def format_notes(notes: dict) -> list[str]:
+    """Format freq_to_note_array output as strings like 'A4 (+3 cents)'."""
+    names = NOTE_NAMES[notes['note'].clip(0)]
+    cents = np.trunc(np.nan_to_num(notes['cents'])).astype(int)
+    return [f"{name}{octave} ({c:+d} cents)" if n >= 0 else "N/A"
+            for n, name, octave, c in zip(notes['note'], names, notes['octave'], cents)]
+
+
+def freq_to_note(freq: float) -> str:
+    """Convert frequency to musical note name."""
+    return format_notes(freq_to_note_array([freq]))[0]
@@ -0,0 +1,238 @@
+"""
+Vectorized peak re-picking over a spectrum archive.
+
+Recomputes what analyze_horn.pick_peaks reports (fundamental, harmonics,
+dual horn) for every stored spectrum at once, for any parameter set, so
+tuning the peak picker no longer means re-decoding the corpus.
+
+scipy's find_peaks applies height, then distance, then prominence. Only
+the first two need a per-row pass; those candidate peaks are cached and
+everything downstream (prominence, horn window, dual-horn ratio test,
+harmonics) runs as array operations over all files.
+
+Usage:
+    python peak_engine.py spectra/ --output repicked.csv
+    python peak_engine.py spectra/ --set prominence=6 --set horn_max=900
+    python peak_engine.py spectra/ --labels labels.csv \\
+        --grid height=-50,-40,-30 --grid prominence=6,8,10,12 --grid dual_max=1.3,1.35,1.4
+"""
+
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks, peak_prominences
+
+from analyze_horn import PEAK_DEFAULTS
+from music_notes import format_notes, freq_to_note_array
+from spectrum_archive import open_archive, spectra_db
+
+
+class PeakEngine:
+    """
+    Peak picker over a (files x bins) matrix of averaged magnitude spectra.
+
+    Parameters:
+        spectra: (files x bins) magnitude spectra (e.g. ArchiveView.spectra)
+        freqs: Bin frequencies in Hz
+    """
+
+    def __init__(self, spectra: np.ndarray, freqs: np.ndarray):
+        self.spectra_db = spectra_db(np.asarray(spectra))
+        self.freqs = freqs
+        self._candidates = {}
+
+    def candidates(self, height: float, distance: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Peaks surviving the height and distance tests, loudest first, as
+        padded (files x max peaks) arrays of bin index (-1 = none), dB
+        amplitude and prominence. Cached per (height, distance).
+        """
+        key = (height, distance)
+        if key not in self._candidates:
+            per_row = []
+            for row in self.spectra_db:
+                peaks, _ = find_peaks(row, height=height, distance=distance)
+                order = np.argsort(row[peaks])[::-1]
+                peaks = peaks[order]
+                per_row.append((peaks, peak_prominences(row, peaks)[0] if len(peaks) else peaks))
+
+            width = max((len(peaks) for peaks, _ in per_row), default=0)
+            n_files = len(per_row)
+            bins = np.full((n_files, max(width, 1)), -1, dtype=np.int64)
+            proms = np.zeros((n_files, max(width, 1)), dtype=np.float32)
+            for i, (peaks, prom) in enumerate(per_row):
+                bins[i, :len(peaks)] = peaks
+                proms[i, :len(peaks)] = prom
+
+            amps = np.take_along_axis(self.spectra_db, bins.clip(0), axis=1)
+            amps[bins < 0] = -np.inf
+            self._candidates[key] = (bins, amps, proms)
+        return self._candidates[key]
+
+    def pick(self, params: dict = None) -> dict:
+        """
+        Vectorized equivalent of pick_peaks for every file.
+
+        Returns:
+            dict of arrays (one entry per file): fundamental_hz (NaN if no
+            peaks), dual_hz (NaN if none), dual_ratio, is_major_third,
+            n_harmonics, n_peaks
+        """
+        p = {**PEAK_DEFAULTS, **(params or {})}
+        bins, amps, proms = self.candidates(p["height"], p["distance"])
+
+        valid = (bins >= 0) & (proms >= p["prominence"])
+        # Re-pack so surviving peaks stay loudest-first at the front of each row
+        order = np.argsort(~valid, axis=1, kind="stable")
+        valid = np.take_along_axis(valid, order, axis=1)
+        f = np.where(valid, self.freqs[np.take_along_axis(bins, order, axis=1).clip(0)], np.nan)
+
+        rows = np.arange(len(f))
+        n_peaks = valid.sum(axis=1)
+        has_peaks = n_peaks > 0
+
+        # Fundamental: loudest peak in the horn window, else loudest overall
+        horn = valid & (f >= p["horn_min"]) & (f <= p["horn_max"])
+        has_horn = horn.any(axis=1)
+        first_horn = horn.argmax(axis=1)
+        fundamental = np.where(has_horn, f[rows, first_horn], f[:, 0])
+        fundamental = np.where(has_peaks, fundamental, np.nan)
+
+        # Harmonics: near-integer multiples 2..6 of the fundamental
+        with np.errstate(invalid="ignore"):
+            ratio = f / fundamental[:, None]
+            harmonic = valid & (ratio > 1.8) & (ratio < 6.2) & (np.abs(ratio - np.round(ratio)) < 0.1)
+
+            # Dual horn: first (loudest) other horn-range peak a third away
+            interval = np.maximum(ratio, 1 / ratio)
+            dual = horn & (f != fundamental[:, None]) & \
+                (interval > p["dual_min"]) & (interval < p["dual_max"])
+        has_dual = dual.any(axis=1)
+        first_dual = dual.argmax(axis=1)
+        dual_ratio = np.where(has_dual, interval[rows, first_dual], np.nan)
+
+        return {
+            "fundamental_hz": fundamental,
+            "dual_hz": np.where(has_dual, f[rows, first_dual], np.nan),
+            "dual_ratio": dual_ratio,
+            "is_major_third": has_dual & (dual_ratio >= p["major_split"]),
+            "n_harmonics": harmonic.sum(axis=1),
+            "n_peaks": n_peaks,
+        }
+
+    def score(self, picked: dict, labels: pd.DataFrame, index: np.ndarray,
+              tolerance_cents: float = 50) -> dict:
+        """
+        Compare picked fundamentals against hand labels.
+
+        Parameters:
+            picked: Output of pick()
+            labels: DataFrame with fundamental_hz and optionally dual_horn
+            index: Row in `picked` for each label row
+            tolerance_cents: Max error for a fundamental to count as correct
+        """
+        est = picked["fundamental_hz"][index]
+        truth = labels["fundamental_hz"].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cents = np.abs(1200 * np.log2(est / truth))
+        cents = np.where(np.isnan(cents), np.inf, cents)
+
+        result = {
+            "accuracy": float((cents <= tolerance_cents).mean()),
+            "median_cents": float(np.median(cents)),
+        }
+        if "dual_horn" in labels:
+            has_dual_label = labels["dual_horn"].notna().to_numpy()
+            has_dual_est = ~np.isnan(picked["dual_hz"][index])
+            result["dual_accuracy"] = float((has_dual_label == has_dual_est).mean())
+        return result
+
+    def grid_search(self, grid: dict, labels: pd.DataFrame, index: np.ndarray,
+                    tolerance_cents: float = 50) -> pd.DataFrame:
+        """
+        Score every combination of parameter values in `grid`
+        (name -> list of values), best first.
+        """
+        names = list(grid)
+        rows = []
+        # Candidate peaks are cached per (height, distance), so only those
+        # two parameters cost a pass over the rows
+        for combo in itertools.product(*grid.values()):
+            params = dict(zip(names, combo))
+            scores = self.score(self.pick(params), labels, index, tolerance_cents)
+            rows.append({**params, **scores})
+
+        sort_cols = ["accuracy"] + (["dual_accuracy"] if "dual_accuracy" in rows[0] else [])
+        table = pd.DataFrame(rows)
+        table["neg_median"] = -table["median_cents"]
+        table = table.sort_values(sort_cols + ["neg_median"], ascending=False)
+        return table.drop(columns="neg_median").reset_index(drop=True)
+
+
+def parse_value(text: str):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def parse_assignments(items: list[str], multi: bool) -> dict:
+    """Parse ["name=v1,v2", ...] into {name: value} or {name: [values]}."""
+    parsed = {}
+    for item in items or []:
+        name, _, values = item.partition("=")
+        if name not in PEAK_DEFAULTS:
+            raise SystemExit(f"Unknown parameter '{name}' (choose from {', '.join(PEAK_DEFAULTS)})")
+        values = [parse_value(v) for v in values.split(",")]
+        parsed[name] = values if multi else values[0]
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-pick horn peaks over a spectrum archive")
+    parser.add_argument("archive", help="Spectrum archive directory (analyze_horn.py --spectra)")
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE",
+                        help="Override a peak parameter (repeatable)")
+    parser.add_argument("--output", "-o", help="Write re-picked results to this CSV")
+    parser.add_argument("--labels", help="CSV of hand labels: filename, fundamental_hz[, dual_horn]")
+    parser.add_argument("--grid", action="append", metavar="NAME=V1,V2,...",
+                        help="Grid-search values for a parameter (repeatable; needs --labels)")
+    parser.add_argument("--tolerance-cents", type=float, default=50,
+                        help="Fundamental error counted as correct")
+    parser.add_argument("--top", type=int, default=10, help="Grid rows to print")
+
+    args = parser.parse_args()
+
+    archive = open_archive(args.archive)
+    engine = PeakEngine(archive.spectra, archive.freqs)
+    params = parse_assignments(args.set, multi=False)
+    print(f"Loaded {len(archive)} spectra ({archive.spectra.shape[1]} bins) from {args.archive}")
+
+    if args.labels:
+        labels = pd.read_csv(args.labels)
+        row_of = {name: i for i, name in enumerate(archive.filenames)}
+        labels = labels[labels["filename"].isin(row_of)].reset_index(drop=True)
+        index = labels["filename"].map(row_of).to_numpy()
+        print(f"Scoring against {len(labels)} labelled files")
+
+        if args.grid:
+            grid = {name: [v] for name, v in params.items()}
+            grid.update(parse_assignments(args.grid, multi=True))
+            table = engine.grid_search(grid, labels, index, args.tolerance_cents)
+            print(f"\nTop {min(args.top, len(table))} of {len(table)} parameter sets:")
+            print(table.head(args.top).to_string(index=False))
+            params = {k: parse_value(str(v)) for k, v in table.iloc[0][list(grid)].items()}
+            print(f"\nBest: {params}")
+        else:
+            print(engine.score(engine.pick(params), labels, index, args.tolerance_cents))
+
+    if args.output:
+        picked = engine.pick(params)
+        out = pd.DataFrame({"filename": archive.filenames, **picked})
+        out["fundamental_note"] = format_notes(freq_to_note_array(picked["fundamental_hz"]))
+        out.to_csv(args.output, index=False)
+        print(f"\nRe-picked results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
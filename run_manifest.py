@@ -0,0 +1,117 @@
+"""
+Checkpoint manifest for long analyze_horn.py batch runs.
+
+The manifest is an append-only JSONL log next to the batch output
+(<output>.manifest.jsonl). Each line records a status change for one
+file: started, done or failed (with the error). Replaying the log on
+restart tells the batch which files to skip, which to retry and which have
+used up their attempts. A file still "running" in the log means the
+process died on it (OOM kill, reboot) and counts as a failed attempt, so a
+file that reliably crashes the process is eventually skipped.
+
+The log is compacted (one line per file) each time a run starts.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+class RunManifest:
+    """
+    Per-file status and attempt counts for a batch run.
+
+    Parameters:
+        path: Manifest JSONL file (created if missing)
+        filenames: Every file the batch wants to process
+        max_attempts: Attempts per file before it is given up on
+        completed: Filenames already present in the batch output; these are
+            done regardless of what the log says
+    """
+
+    def __init__(self, path: str, filenames: list[str], max_attempts: int = 3,
+                 completed: set = ()):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.entries = {}
+
+        if self.path.exists():
+            self._replay()
+
+        for name in filenames:
+            self.entries.setdefault(name, {"status": PENDING, "attempts": 0, "error": None})
+
+        # The batch output is the source of truth for finished files: a file
+        # logged done whose row never got flushed has to run again
+        completed = set(completed)
+        for name, entry in self.entries.items():
+            if name in completed:
+                entry.update(status=DONE, error=None)
+            elif entry["status"] == DONE:
+                entry.update(status=PENDING, attempts=0)
+
+        self._compact()
+        self._log = open(self.path, "a")
+
+    def _replay(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # half-written last line from a crash
+                entry = self.entries.setdefault(
+                    event["file"], {"status": PENDING, "attempts": 0, "error": None})
+                entry["status"] = event["status"]
+                entry["attempts"] = event.get("attempts", entry["attempts"])
+                entry["error"] = event.get("error")
+
+        for entry in self.entries.values():
+            if entry["status"] == RUNNING:
+                entry["status"] = FAILED
+                entry["error"] = "interrupted: process exited while analyzing this file"
+
+    def _compact(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            for name, entry in self.entries.items():
+                f.write(json.dumps({"file": name, **entry}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _record(self, name: str, **fields):
+        entry = self.entries[name]
+        entry.update(fields)
+        self._log.write(json.dumps({"file": name, **entry, "t": round(time.time(), 3)}) + "\n")
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def start(self, name: str):
+        self._record(name, status=RUNNING, attempts=self.entries[name]["attempts"] + 1, error=None)
+
+    def finish(self, name: str):
+        self._record(name, status=DONE)
+
+    def fail(self, name: str, error: str):
+        self._record(name, status=FAILED, error=error)
+
+    def to_run(self) -> list[str]:
+        """Files that are not done and still have attempts left, in manifest order."""
+        return [name for name, e in self.entries.items()
+                if e["status"] != DONE and e["attempts"] < self.max_attempts]
+
+    def counts(self) -> dict:
+        counts = {DONE: 0, FAILED: 0, PENDING: 0, "gave_up": 0}
+        for e in self.entries.values():
+            if e["status"] == FAILED and e["attempts"] >= self.max_attempts:
+                counts["gave_up"] += 1
+            else:
+                counts[e["status"]] += 1
+        return counts
+
+    def close(self):
+        self._log.close()
@@ -0,0 +1,157 @@
+"""
+Memory-mapped archive of averaged horn spectra.
+
+analyze_horn.py --spectra DIR stores each file's averaged magnitude
+spectrum (the one extract_frequencies picks peaks from) as one row of a
+float32 (files x bins) matrix, so new questions can be answered without
+re-decoding any audio.
+
+Layout of DIR:
+    spectra.npy   float32 matrix, memory-mapped (capacity x n_bins)
+    index.csv     row,filename - one line per stored spectrum, appended as files finish
+    meta.json     sample rate, n_fft, n_bins, capacity
+
+Usage:
+    archive = open_archive("spectra/")
+    S_db = spectra_db(archive.spectra)        # (files x bins) dB, as librosa would compute
+"""
+
+import csv
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+class SpectrumArchive:
+    """
+    Append-only writer for a spectrum archive directory.
+
+    Parameters:
+        path: Archive directory (created if missing)
+        capacity: Number of rows (files) to make room for; reopening an
+            existing archive grows it so this many more rows fit
+        sr: Sample rate the spectra were computed at
+        n_fft: FFT size the spectra were computed with
+    """
+
+    def __init__(self, path: str, capacity: int, sr: int = 22050, n_fft: int = 4096):
+        self.path = Path(path)
+        self.sr = sr
+        self.n_fft = n_fft
+        self.n_bins = n_fft // 2 + 1
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        matrix_path = self.path / "spectra.npy"
+        meta_path = self.path / "meta.json"
+
+        if meta_path.exists():
+            # Reopen an existing archive and keep appending after its last row
+            meta = json.loads(meta_path.read_text())
+            if (meta["sr"], meta["n_fft"]) != (sr, n_fft):
+                raise ValueError(f"Archive at {path} was built with sr={meta['sr']}, "
+                                 f"n_fft={meta['n_fft']}; got sr={sr}, n_fft={n_fft}")
+            self.n_rows = len(_read_index(self.path / "index.csv"))
+            self.capacity = meta["capacity"]
+            if self.n_rows + capacity > self.capacity:
+                self._grow(matrix_path, self.n_rows + capacity)
+                meta["capacity"] = self.capacity
+                meta_path.write_text(json.dumps(meta, indent=2))
+            self.spectra = np.load(matrix_path, mmap_mode="r+")
+        else:
+            self.capacity = capacity
+            self.spectra = np.lib.format.open_memmap(
+                matrix_path, mode="w+", dtype=np.float32, shape=(capacity, self.n_bins))
+            meta_path.write_text(json.dumps({
+                "sr": sr, "n_fft": n_fft, "n_bins": self.n_bins, "capacity": capacity,
+            }, indent=2))
+            self.n_rows = 0
+
+        self._index = open(self.path / "index.csv", "a", newline="")
+        self._writer = csv.writer(self._index)
+        if self.n_rows == 0 and self._index.tell() == 0:
+            self._writer.writerow(["row", "filename"])
+
+    def _grow(self, matrix_path: Path, capacity: int):
+        """Copy the matrix into a larger one (rows already written are kept)."""
+        old = np.load(matrix_path, mmap_mode="r")
+        tmp_path = matrix_path.with_suffix(".tmp.npy")
+        grown = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.n_bins))
+        grown[:self.n_rows] = old[:self.n_rows]
+        grown.flush()
+        del grown, old
+        tmp_path.replace(matrix_path)
+        self.capacity = capacity
+
+    def append(self, filename: str, spectrum: np.ndarray, sr: int):
+        """Store one averaged magnitude spectrum."""
+        if sr != self.sr or len(spectrum) != self.n_bins:
+            raise ValueError(f"Spectrum for {filename} (sr={sr}, {len(spectrum)} bins) does not "
+                             f"match archive (sr={self.sr}, {self.n_bins} bins)")
+        if self.n_rows >= self.capacity:
+            raise ValueError(f"Spectrum archive is full ({self.capacity} rows)")
+
+        self.spectra[self.n_rows] = spectrum
+        # Data row before index row, so an interrupted run never indexes garbage
+        self.spectra.flush()
+        self._writer.writerow([self.n_rows, filename])
+        self._index.flush()
+        self.n_rows += 1
+
+    def close(self):
+        self.spectra.flush()
+        self._index.close()
+
+
+class ArchiveView:
+    """Read-only view of a spectrum archive (see open_archive)."""
+
+    def __init__(self, spectra: np.ndarray, filenames: list[str], sr: int, n_fft: int):
+        self.spectra = spectra
+        self.filenames = filenames
+        self.sr = sr
+        self.n_fft = n_fft
+        self.freqs = np.fft.rfftfreq(n_fft, 1 / sr)
+
+    def __len__(self):
+        return len(self.filenames)
+
+
+def _read_index(index_path: Path) -> list[tuple[int, str]]:
+    if not index_path.exists():
+        return []
+    with open(index_path, newline="") as f:
+        return [(int(row["row"]), row["filename"]) for row in csv.DictReader(f)]
+
+
+def open_archive(path: str) -> ArchiveView:
+    """
+    Open an archive read-only.
+
+    If a file was stored more than once (e.g. a re-run), its latest row wins.
+    """
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text())
+    matrix = np.load(path / "spectra.npy", mmap_mode="r")
+
+    latest = {}
+    for row, filename in _read_index(path / "index.csv"):
+        latest[filename] = row
+
+    rows = np.fromiter(latest.values(), dtype=np.int64, count=len(latest))
+    if len(rows) and np.array_equal(rows, np.arange(len(rows))):
+        spectra = matrix[:len(rows)]  # stays memory-mapped
+    else:
+        spectra = matrix[rows]
+
+    return ArchiveView(spectra, list(latest), meta["sr"], meta["n_fft"])
+
+
+def spectra_db(spectra: np.ndarray, amin: float = 1e-5, top_db: float = 80.0) -> np.ndarray:
+    """
+    Row-wise librosa.amplitude_to_db(ref=1.0) over a (files x bins) matrix:
+    20*log10(magnitude), floored at each row's max minus top_db.
+    """
+    db = 20 * np.log10(np.maximum(amin, spectra, dtype=np.float32))
+    return np.maximum(db, db.max(axis=1, keepdims=True) - top_db)
@@ -0,0 +1,139 @@
+"""
+Per-stage timing instrumentation for the horn analysis pipeline.
+
+analyze_horn.analyze_file() wraps each stage (decode, resample, segment,
+stft, peaks, plot) in `stage(trace, name)`. With no trace attached this is
+a no-op; with a StageTrace it records wall time, CPU time and (optionally)
+bytes allocated per stage, per file.
+
+Usage:
+    trace = StageTrace("trace.jsonl", track_memory=True)
+    for f in files:
+        analyze_file(f, trace=trace)
+    print(trace.summary_table())
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+
+def stage(trace, name: str):
+    """Context manager timing `name` on `trace`, or a no-op if trace is None."""
+    if trace is None:
+        return nullcontext()
+    return trace.stage(name)
+
+
+class StageTrace:
+    """
+    Collects per-file, per-stage timings and streams them as JSONL.
+
+    Parameters:
+        path: Optional JSONL file; one record is appended per finished file
+        track_memory: Record peak bytes allocated per stage via tracemalloc
+            (adds noticeable overhead, so off by default)
+    """
+
+    def __init__(self, path: str = None, track_memory: bool = False):
+        self.path = path
+        self.track_memory = track_memory
+        self.records = []
+        self._current = None
+        self._file = open(path, "a") if path else None
+
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start_file(self, filename: str):
+        self._current = {"file": filename, "stages": {}, "t0": time.perf_counter()}
+
+    def end_file(self, status: str = "ok") -> dict:
+        record = self._current
+        if record is None:
+            return None
+        self._current = None
+
+        record["total_s"] = time.perf_counter() - record.pop("t0")
+        record["status"] = status
+        self.records.append(record)
+
+        if self._file:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+        return record
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            mem_start = tracemalloc.get_traced_memory()[0]
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = {
+                "wall_s": time.perf_counter() - wall0,
+                "cpu_s": time.process_time() - cpu0,
+            }
+            if self.track_memory:
+                entry["alloc_bytes"] = tracemalloc.get_traced_memory()[1] - mem_start
+            if self._current is not None:
+                # Repeated stages within one file accumulate
+                prev = self._current["stages"].get(name)
+                if prev:
+                    entry = {k: prev[k] + entry[k] for k in entry}
+                self._current["stages"][name] = entry
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def summary_table(self, n_slowest: int = 5) -> str:
+        """p50/p95 per stage across all recorded files, plus the slowest files."""
+        if not self.records:
+            return "No files traced"
+
+        stage_names = []
+        for r in self.records:
+            for name in r["stages"]:
+                if name not in stage_names:
+                    stage_names.append(name)
+
+        header = f"{'stage':<12} {'files':>6} {'wall p50':>10} {'wall p95':>10} {'cpu p50':>10} {'cpu p95':>10}"
+        if self.track_memory:
+            header += f" {'MB p50':>8} {'MB p95':>8}"
+        lines = [header, "-" * len(header)]
+
+        for name in stage_names + ["total"]:
+            if name == "total":
+                entries = [{"wall_s": r["total_s"]} for r in self.records]
+            else:
+                entries = [r["stages"][name] for r in self.records if name in r["stages"]]
+            wall = np.array([e["wall_s"] for e in entries]) * 1e3
+            line = f"{name:<12} {len(entries):>6} " \
+                   f"{np.percentile(wall, 50):>8.1f}ms {np.percentile(wall, 95):>8.1f}ms"
+            if name == "total":
+                lines.append(line)
+                continue
+            cpu = np.array([e["cpu_s"] for e in entries]) * 1e3
+            line += f" {np.percentile(cpu, 50):>8.1f}ms {np.percentile(cpu, 95):>8.1f}ms"
+            if self.track_memory:
+                mb = np.array([e["alloc_bytes"] for e in entries]) / 1e6
+                line += f" {np.percentile(mb, 50):>8.1f} {np.percentile(mb, 95):>8.1f}"
+            lines.append(line)
+
+        slowest = sorted(self.records, key=lambda r: r["total_s"], reverse=True)[:n_slowest]
+        lines.append("")
+        lines.append("Slowest files:")
+        for r in slowest:
+            worst = max(r["stages"].items(), key=lambda kv: kv[1]["wall_s"], default=("-", {"wall_s": 0}))
+            lines.append(f"  {r['total_s'] * 1e3:8.1f}ms  {r['file']}  (mostly {worst[0]})")
+
+        return "\n".join(lines)
@@ -0,0 +1,264 @@
+"""
+Synthetic car horn signals and datasets.
+
+Deterministic stand-ins for real recordings, used to benchmark and validate
+the analysis code offline.
+"""
+
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Relative amplitudes of harmonics 1..6 for a typical disc horn
+HORN_HARMONICS = (1.0, 0.5, 0.3, 0.15, 0.08, 0.04)
+
+# Samples per block when rendering mixtures block by block (~6 s at 44.1 kHz)
+BLOCK = 1 << 18
+
+
+def _spans(n: int, block: int) -> list[tuple[int, int]]:
+    return [(a, min(a + block, n)) for a in range(0, n, block)]
+
+
+def _harmonic_sum(f0: float, harmonics: tuple, a: int, b: int, sr: int) -> np.ndarray:
+    """Samples a:b of a horn's harmonic series, before peak normalization."""
+    # Phase in float64: a float32 time axis loses sub-sample resolution
+    # after a few minutes and the tone drifts audibly
+    t = np.arange(a, b) / sr
+    y = np.zeros(b - a, dtype=np.float32)
+    for k, amp in enumerate(harmonics, start=1):
+        if k * f0 < sr / 2:
+            y += (amp * np.sin(2 * np.pi * k * f0 * t)).astype(np.float32)
+    return y
+
+
+def horn_tone(f0: float, duration: float, sr: int = 22050,
+              harmonics: tuple = HORN_HARMONICS, amplitude: float = 0.5) -> np.ndarray:
+    """Render a single horn: fundamental plus decaying harmonics."""
+    y = _harmonic_sum(f0, harmonics, 0, int(round(duration * sr)), sr)
+    return (amplitude * y / np.abs(y).max()).astype(np.float32)
+
+
+def pure_tone(f0: float, duration: float, sr: int = 22050, amplitude: float = 0.5) -> np.ndarray:
+    """Render a pure sine tone."""
+    return horn_tone(f0, duration, sr, harmonics=(1.0,), amplitude=amplitude)
+
+
+def dual_horn(f0: float, duration: float, sr: int = 22050, ratio: float = 5 / 4,
+              amplitude: float = 0.5) -> np.ndarray:
+    """Render a dual-horn pair (default: major third above f0)."""
+    y = horn_tone(f0, duration, sr) + 0.8 * horn_tone(f0 * ratio, duration, sr)
+    return (amplitude * y / np.abs(y).max()).astype(np.float32)
+
+
+def noise(duration: float, sr: int = 22050, amplitude: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Render white noise."""
+    rng = np.random.default_rng(seed)
+    return (amplitude * rng.standard_normal(int(round(duration * sr)))).astype(np.float32)
+
+
+def honk_clip(kind: str, duration: float, sr: int = 22050, f0: float = 440.0,
+              lead: float = 0.25, seed: int = 0) -> np.ndarray:
+    """
+    Render a clip shaped like a horn test recording: quiet lead-in, the
+    honk, quiet tail, all over a low noise floor.
+
+    kind is one of "pure", "dual" or "noise" (noise only, no honk).
+    """
+    n = int(round(duration * sr))
+    y = noise(duration, sr, amplitude=0.005, seed=seed)
+    if kind == "noise":
+        return y + noise(duration, sr, amplitude=0.2, seed=seed + 1)
+
+    render = {"pure": pure_tone, "dual": dual_horn}[kind]
+    start = min(int(lead * sr), n // 4)
+    end = n - start
+    y[start:end] += render(f0, (end - start) / sr, sr)[:end - start]
+    return y
+
+
+def synthetic_frequencies(n: int, seed: int = 0,
+                          source: str = 'horn_data_cleaned.csv') -> np.ndarray:
+    """
+    Draw n horn fundamentals by resampling the measured dataset with a
+    small (±20 cents) jitter, so large synthetic fleets keep its shape.
+    """
+    measured = pd.read_csv(source)['fundamental_hz'].values
+    rng = np.random.default_rng(seed)
+    base = rng.choice(measured, n, replace=True)
+    return base * 2 ** (rng.uniform(-20, 20, n) / 1200)
+
+
+def _walk_blocks(n: int, seed: int, block: int):
+    """The random walk traffic_noise is built from, as (a, b, samples a:b) blocks."""
+    rng = np.random.default_rng(seed)
+    carry = 0.0
+    for a, b in _spans(n, block):
+        # Prepending the carry keeps the summation order of one np.cumsum
+        walk = np.cumsum(np.concatenate([[carry], rng.standard_normal(b - a)]))[1:]
+        carry = walk[-1]
+        yield a, b, walk
+
+
+def _detrended_blocks(walks, n: int, first: float, last: float):
+    """Random walk blocks minus the line from its first to its last sample."""
+    step = (last - first) / (n - 1) if n > 1 else 0.0
+    for a, b, walk in walks:
+        line = np.arange(a, b) * step + first  # as np.linspace computes it
+        if b == n and n > 1:
+            line[-1] = last
+        yield walk - line
+
+
+def traffic_noise_blocks(duration: float, sr: int = 22050, amplitude: float = 0.05, seed: int = 0,
+                         block: int = BLOCK):
+    """
+    traffic_noise in consecutive blocks of at most `block` samples. The
+    walk is regenerated for each whole-clip statistic (its ends, mean and
+    peak) instead of being kept in memory.
+    """
+    n = int(round(duration * sr))
+    single = list(_walk_blocks(n, seed, block)) if n <= block else None  # one block: keep it
+
+    def walk_blocks():
+        return iter(single) if single is not None else _walk_blocks(n, seed, block)
+
+    first = last = 0.0
+    for a, b, walk in walk_blocks():
+        first = walk[0] if a == 0 else first
+        last = walk[-1]
+
+    total, low, high = 0.0, np.inf, -np.inf
+    for d in _detrended_blocks(walk_blocks(), n, first, last):
+        total += d.sum()
+        low, high = min(low, d.min()), max(high, d.max())
+    mean = total / max(n, 1)
+    peak = max(high - mean, mean - low)
+
+    for d in _detrended_blocks(walk_blocks(), n, first, last):
+        yield (amplitude * (d - mean) / (peak + 1e-12)).astype(np.float32)
+
+
+def traffic_noise(duration: float, sr: int = 22050, amplitude: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Render low-frequency-heavy (brown) noise resembling traffic rumble."""
+    blocks = list(traffic_noise_blocks(duration, sr, amplitude, seed))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def render_mixture(horns: list[dict], duration: float, sr: int = 22050, snr_db: float = 20.0,
+                   seed: int = 0) -> np.ndarray:
+    """
+    Render several horns over traffic noise.
+
+    Parameters:
+        horns: One dict per horn with keys f0, dual (Hz or None), gain,
+            start and stop (seconds)
+        duration: Clip length in seconds
+        sr: Sample rate
+        snr_db: Loudest horn's RMS relative to the noise RMS
+        seed: Seed for harmonic jitter and noise
+
+    Returns:
+        float32 samples in [-1, 1]
+    """
+    blocks = list(mixture_blocks(horns, duration, sr, snr_db, seed))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def _period_peak(f0: float, harmonics: tuple, sr: int, points: int = 4096) -> float:
+    """Peak of _harmonic_sum, found over one period since the series repeats every 1/f0."""
+    phase = np.arange(points) / points
+    y = np.zeros(points)
+    for k, amp in enumerate(harmonics, start=1):
+        if k * f0 < sr / 2:
+            y += amp * np.sin(2 * np.pi * k * phase)
+    return float(np.abs(y).max())
+
+
+def mixture_blocks(horns: list[dict], duration: float, sr: int = 22050, snr_db: float = 20.0,
+                   seed: int = 0, block: int = BLOCK):
+    """
+    render_mixture in consecutive blocks of at most `block` samples, so a
+    clip of any length is rendered in O(block) memory. The horns are
+    synthesized once into a float32 scratch file; the noise level and the
+    final peak normalization are then applied in streaming passes over it.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(round(duration * sr))
+
+    layers = []
+    for horn in horns:
+        start, stop = int(horn["start"] * sr), min(n, int(horn["stop"] * sr))
+        harmonics = tuple(np.array(HORN_HARMONICS) * rng.uniform(0.7, 1.3, len(HORN_HARMONICS)))
+        partials = [(horn["f0"], 1.0)] + ([(horn["dual"], 0.8)] if horn.get("dual") else [])
+        # horn_tone normalizes each partial by its own peak
+        layers.append({"start": start, "length": max(stop - start, 0), "harmonics": harmonics,
+                       "gain": horn["gain"], "power": 0.0,
+                       "partials": [(f, weight, _period_peak(f, harmonics, sr)) for f, weight in partials]})
+
+    def tone(layer, a, b):
+        # Samples a:b (relative to the horn's start) of the gain-scaled horn
+        y = None
+        for f, weight, peak in layer["partials"]:
+            part = (_harmonic_sum(f, layer["harmonics"], a, b, sr) / peak).astype(np.float32)
+            y = part if y is None else y + weight * part
+        y *= layer["gain"]
+        return y
+
+    single = None
+
+    def rumble_blocks():
+        if single is not None:
+            return iter(single)
+        return traffic_noise_blocks(duration, sr, amplitude=1.0, seed=seed + 1, block=block)
+
+    if n <= block:
+        single = list(rumble_blocks())  # one block: keep it rather than regenerate it
+
+    with tempfile.TemporaryFile() as scratch:
+        for a, b in _spans(n, block):
+            y = np.zeros(b - a, dtype=np.float32)
+            for layer in layers:
+                lo, hi = max(a, layer["start"]), min(b, layer["start"] + layer["length"])
+                if lo < hi:
+                    part = tone(layer, lo - layer["start"], hi - layer["start"])
+                    layer["power"] += float(np.sum(part ** 2, dtype=np.float64))
+                    y[lo - a:hi - a] += part
+            scratch.write(y.tobytes())
+
+        loudest_rms = max((np.sqrt(layer["power"] / max(layer["length"], 1)) for layer in layers),
+                          default=0.0)
+        rumble_power = sum(float(np.sum(r ** 2, dtype=np.float64)) for r in rumble_blocks())
+        rumble_gain = loudest_rms / (np.sqrt(rumble_power / max(n, 1)) + 1e-12) / 10 ** (snr_db / 20)
+
+        # Mix the rumble in place, tracking the peak for the final pass
+        peak = 0.0
+        scratch.seek(0)
+        for (a, b), rumble in zip(_spans(n, block), rumble_blocks()):
+            y = np.frombuffer(scratch.read(4 * (b - a)), dtype=np.float32).copy()
+            y += rumble * np.float32(rumble_gain)
+            peak = max(peak, float(np.abs(y).max()))
+            scratch.seek(4 * a)
+            scratch.write(y.tobytes())
+
+        scratch.seek(0)
+        for a, b in _spans(n, block):
+            y = np.frombuffer(scratch.read(4 * (b - a)), dtype=np.float32)
+            yield (0.9 * y / (peak + 1e-12)).astype(np.float32)
+
+
+def open_wav_memmap(path, n_samples: int, sr: int) -> np.ndarray:
+    """
+    Create a mono 16-bit PCM WAV of n_samples and return its sample data as
+    a writable np.memmap, so large clips can be filled in place.
+    """
+    import struct
+
+    data_bytes = 2 * n_samples
+    header = struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_bytes, b'WAVE',
+                         b'fmt ', 16, 1, 1, sr, 2 * sr, 2, 16, b'data', data_bytes)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(len(header) + data_bytes)
+    return np.memmap(path, dtype='<i2', mode='r+', offset=len(header), shape=(n_samples,))
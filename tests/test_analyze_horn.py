@@ -0,0 +1,49 @@
+import sys
+
+import pytest
+
+sf = pytest.importorskip("soundfile")
+pytest.importorskip("librosa")
+
+import analyze_horn
+import synthetic_horns as synth
+from batch_output import read_results
+from spectrum_archive import open_archive
+
+
+@pytest.fixture
+def clips(tmp_path):
+    folder = tmp_path / "clips"
+    folder.mkdir()
+    for i, f0 in enumerate([350.0, 420.0, 510.0]):
+        sf.write(folder / f"car_{i}_2023.wav", synth.honk_clip("pure", 2.0, 22050, f0=f0, seed=i), 22050)
+    return folder
+
+
+def test_extract_frequencies_reports_spectrum(clips):
+    y, sr = analyze_horn.load_audio(str(clips / "car_1_2023.wav"))
+    seen = []
+    results = analyze_horn.extract_frequencies(y, sr, on_spectrum=lambda f, s: seen.append((f, s)))
+    freqs, spectrum = seen[0]
+    assert results == analyze_horn.pick_peaks(freqs, spectrum)
+    assert abs(results["fundamental_hz"] - 420) < 10
+
+
+def test_retried_file_archived_once(clips, tmp_path, monkeypatch):
+    failed = set()
+
+    def flaky_plot(y, sr, results, save_path=None):
+        # Every file fails once after its spectrum has been computed
+        if save_path not in failed:
+            failed.add(save_path)
+            raise RuntimeError("plot failed")
+
+    monkeypatch.setattr(analyze_horn, "plot_spectrum", flaky_plot)
+    output, spectra = tmp_path / "out.csv", tmp_path / "spectra"
+    monkeypatch.setattr(sys, "argv", ["analyze_horn.py", str(clips), "--batch", "--plot",
+                                      "--output", str(output), "--checkpoint", "--spectra", str(spectra)])
+    analyze_horn.main()
+
+    archive = open_archive(str(spectra))
+    assert sorted(archive.filenames) == ["car_0_2023.wav", "car_1_2023.wav", "car_2_2023.wav"]
+    assert len(read_results(str(output))) == 3
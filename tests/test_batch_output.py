@@ -0,0 +1,62 @@
+import pytest
+
+from batch_output import CsvWriter, JsonlWriter, ParquetWriter, open_writer, read_results
+
+
+def result(name: str, f0: float = 440.0) -> dict:
+    return {
+        "filename": name,
+        "fundamental_hz": f0,
+        "fundamental_note": "A4 (+0 cents)",
+        "dual_horn": {"frequency": 554.4, "interval": "major third", "ratio": 1.26},
+        "harmonics": [(880.0, 2)],
+        "all_peaks_hz": [f0, 554.4, 880.0],
+        "peak_amplitudes_db": [-3.0, -6.0, -20.0],
+    }
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".jsonl"])
+def test_line_writer_resume_drops_torn_row(tmp_path, suffix):
+    path = tmp_path / f"out{suffix}"
+    writer = open_writer(str(path))
+    writer.write(result("a.wav"))
+    writer.write(result("b.wav"))
+    writer.close()
+    with open(path, "a") as f:
+        f.write("c.wav,44")  # crash mid-row
+
+    writer = open_writer(str(path), resume=True)
+    assert writer.done == {"a.wav", "b.wav"}
+    writer.write(result("c.wav"))
+    writer.close()
+    assert list(read_results(str(path))["filename"]) == ["a.wav", "b.wav", "c.wav"]
+
+
+def test_unknown_suffix_writes_csv(tmp_path):
+    writer = open_writer(str(tmp_path / "out.txt"))
+    assert isinstance(writer, CsvWriter)
+    writer.close()
+    assert isinstance(open_writer(str(tmp_path / "out.jsonl")), JsonlWriter)
+
+
+def test_parquet_resume_ignores_crashed_flush(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "out.parquet"
+    writer = open_writer(str(path), flush_every=2)
+    assert isinstance(writer, ParquetWriter)
+    for name in ["a.wav", "b.wav", "c.wav"]:
+        writer.write(result(name))
+    # Crash: c.wav is still buffered and a flush died before its rename
+    (path / ".part-00001.tmp").write_bytes(b"not parquet")
+    assert sorted(read_results(str(path))["filename"]) == ["a.wav", "b.wav"]
+
+    writer = open_writer(str(path), resume=True, flush_every=2)
+    assert writer.done == {"a.wav", "b.wav"}
+    assert not list(path.glob(".part-*.tmp"))
+    writer.write(result("c.wav", 415.0))
+    writer.close()
+
+    table = read_results(str(path)).sort_values("filename")
+    assert list(table["filename"]) == ["a.wav", "b.wav", "c.wav"]
+    assert table["fundamental_hz"].iloc[-1] == 415.0
+    assert table["dual_horn"].iloc[0]["frequency"] == 554.4
@@ -0,0 +1,72 @@
+from ingest import HornStore, car_key, match_year, unique_cars
+
+
+def test_car_key_normalizes_spellings():
+    assert car_key("Mercedes-Benz C-Class 2023") == ("mercedes", "cclass", "2023")
+    assert car_key("mercedes_c-class_2023.webm") == ("mercedes", "cclass", "2023")
+    assert car_key("Mercedes C Class 2023") == ("mercedes", "cclass", "2023")
+    assert car_key("tesla_model_s.wav") == ("tesla", "models", "")
+
+
+def test_match_year():
+    assert match_year("2022", {"2022", "2023"}) == "2022"
+    assert match_year("", {"2022", "2023"}) == "2023"
+    assert match_year("2021", {"", "2023"}) == ""
+    assert match_year("2021", {"2023"}) is None
+    assert match_year("", ()) is None
+
+
+def test_unique_cars_keeps_first_spelling():
+    assert unique_cars(["Mercedes C Class 2023", "Mercedes-Benz C-Class 2023", "VW Golf 2022"]) == \
+        ["Mercedes C Class 2023", "VW Golf 2022"]
+
+
+def test_merge_and_replay(tmp_path):
+    path = tmp_path / "store.jsonl"
+    store = HornStore(path)
+    counts = store.merge([{"filename": "honda_civic_2022.webm", "fundamental_hz": 400.0},
+                          {"filename": "toyota_camry_2022.wav", "fundamental_hz": 420.0}])
+    assert counts == {"added": 2, "replaced": 0, "duplicate": 0}
+    counts = store.merge([{"filename": "honda_civic_2022.wav", "fundamental_hz": 405.0},
+                          {"filename": "toyota_camry_2022.webm", "fundamental_hz": 430.0}])
+    assert counts == {"added": 0, "replaced": 1, "duplicate": 1}
+    store.close()
+
+    store = HornStore(path)
+    assert len(store) == 2
+    assert store.find("Honda Civic 2022")["row"]["filename"] == "honda_civic_2022.wav"
+    store.close()
+
+
+def test_key_change_survives_replay_and_compact(tmp_path):
+    path = tmp_path / "store.jsonl"
+    store = HornStore(path)
+    store.merge([{"filename": "tesla_model_s.webm", "fundamental_hz": 400.0}])
+    counts = store.merge([{"filename": "tesla_model_s_2022.wav", "fundamental_hz": 410.0}])
+    assert counts["replaced"] == 1 and len(store) == 1
+    store.close()
+
+    for _ in range(2):
+        store = HornStore(path)
+        assert len(store) == 1
+        assert store.find("Tesla Model S")["row"]["fundamental_hz"] == 410.0
+        store.compact()
+        store.close()
+
+
+def test_replay_skips_torn_last_line(tmp_path):
+    path = tmp_path / "store.jsonl"
+    store = HornStore(path)
+    store.merge([{"filename": "kia_rio_2021.wav"}])
+    store.close()
+    with open(path, "a") as f:
+        f.write('{"key": ["kia", "ri')
+
+    store = HornStore(path)
+    assert len(store) == 1
+    store.merge([{"filename": "kia_ceed_2021.wav"}])
+    store.close()
+
+    store = HornStore(path)
+    assert len(store) == 2
+    store.close()
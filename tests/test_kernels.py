@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import kernels
+from consonance_analysis import chord_dissonance, trio_dissonance
+
+
+@pytest.fixture(params=["numba", "numpy"])
+def backend(request, monkeypatch):
+    if request.param == "numba" and not kernels.HAVE_NUMBA:
+        pytest.skip("numba not installed")
+    if request.param == "numpy":
+        monkeypatch.setattr(kernels, "HAVE_NUMBA", False)
+    return request.param
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_pair_dissonance(backend, parallel):
+    rng = np.random.default_rng(0)
+    f1, f2 = rng.uniform(150, 800, (2, 1000))
+    got = kernels.pair_dissonance(f1, f2, parallel=parallel)
+    np.testing.assert_allclose(got, kernels.sethares_dissonance_array(f1, f2), rtol=1e-12, atol=1e-15)
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_chord_dissonance_rows(backend, parallel):
+    rng = np.random.default_rng(1)
+    trios = rng.uniform(150, 800, (1000, 3))
+    got = kernels.chord_dissonance_rows(trios, parallel=parallel)
+    np.testing.assert_allclose(got, trio_dissonance(trios), rtol=1e-12, atol=1e-15)
+
+
+def test_chord_dissonance_rows_skips_nan(backend):
+    chords = np.array([[300.0, 400.0, np.nan, 500.0],
+                       [np.nan, np.nan, np.nan, np.nan],
+                       [440.0, np.nan, 466.2, np.nan]])
+    expected = [chord_dissonance([300.0, 400.0, 500.0]), 0.0, chord_dissonance([440.0, 466.2])]
+    np.testing.assert_allclose(kernels.chord_dissonance_rows(chords), expected, rtol=1e-12)
+
+
+def test_frame_rms_matches_librosa(backend):
+    librosa = pytest.importorskip("librosa")
+    y = np.random.default_rng(2).standard_normal(22050 * 2 + 123).astype(np.float32)
+    got = kernels.frame_rms(y)
+    np.testing.assert_allclose(got, librosa.feature.rms(y=y)[0], rtol=1e-5)
+
+
+def reference_run(values, threshold):
+    # The starts/ends bookkeeping find_horn_segment used before first_run_above
+    above = values > threshold
+    if not above.any():
+        return -1, -1
+    starts = np.where(np.diff(above.astype(int)) == 1)[0]
+    ends = np.where(np.diff(above.astype(int)) == -1)[0]
+    if len(starts) == 0:
+        starts = np.array([0])
+    if len(ends) == 0:
+        ends = np.array([len(values) - 1])
+    if ends[0] < starts[0]:
+        starts = np.insert(starts, 0, 0)
+    return int(starts[0]), int(ends[0])
+
+
+def test_first_run_above(backend):
+    rng = np.random.default_rng(3)
+    for _ in range(2000):
+        values = rng.uniform(-1, 1, rng.integers(1, 20))
+        assert tuple(kernels.first_run_above(values, 0.3)) == reference_run(values, 0.3)
+
+
+def test_threaded_run_after_parallel_kernel_is_cached(tmp_path):
+    # The serial and parallel flavours must not share one on-disk cache entry:
+    # a cached prange kernel run from several threads hangs
+    if not kernels.HAVE_NUMBA:
+        pytest.skip("numba not installed")
+    root = Path(__file__).resolve().parent.parent
+    env = {**os.environ, "NUMBA_CACHE_DIR": str(tmp_path), "MPLBACKEND": "Agg"}
+    warm = "import numpy as np, kernels; kernels.chord_dissonance_rows(np.full((4, 3), 440.0), parallel=True)"
+    threaded = ("import numpy as np; from consonance_analysis import monte_carlo_stream; "
+                "print(monte_carlo_stream(np.linspace(300, 600, 50), 20000, n_workers=2, threads=True).count)")
+    subprocess.run([sys.executable, "-c", warm], cwd=root, env=env, check=True, timeout=600)
+    out = subprocess.run([sys.executable, "-c", threaded], cwd=root, env=env, check=True, timeout=600,
+                         capture_output=True, text=True)
+    assert out.stdout.strip() == "20000"
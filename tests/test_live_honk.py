@@ -0,0 +1,47 @@
+import io
+import json
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+pytest.importorskip("librosa")
+
+import live_honk
+import synthetic_horns as synth
+
+
+def wav_bytes(y, sr):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sr)
+        wav.writeframes((np.clip(y, -1, 1) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def run_main(monkeypatch, capsys, data):
+    monkeypatch.setattr(sys, "argv", ["live_honk.py", "-"])
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data)))
+    live_honk.main()
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+@pytest.mark.parametrize("f0", [330.0, 440.0, 466.2, 610.0])
+def test_main_reports_one_honk_at_the_right_pitch(monkeypatch, capsys, f0):
+    sr = 44100
+    events = run_main(monkeypatch, capsys, wav_bytes(synth.honk_clip("pure", 1.5, sr, f0=f0), sr))
+
+    assert [e["event"] for e in events] == ["honk_start", "honk_end"]
+    start, end = events
+    assert abs(1200 * np.log2(start["fundamental_hz"] / f0)) < 50
+    assert start["t"] - start["onset_t"] >= 0.06
+    assert end["duration_s"] == pytest.approx(1.0, abs=0.1)
+
+
+def test_noise_only_stream_reports_nothing_pitched(monkeypatch, capsys):
+    sr = 22050
+    y = synth.noise(1.0, sr, amplitude=0.005)
+    assert run_main(monkeypatch, capsys, wav_bytes(y, sr)) == []
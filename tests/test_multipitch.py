@@ -0,0 +1,48 @@
+import numpy as np
+
+from multipitch import MultiPitch, window_dissonance
+from synthetic_horns import render_mixture
+
+HORNS = [{"f0": 400.0, "dual": None, "gain": 1.0, "start": 0.0, "stop": 2.0},
+         {"f0": 600.0, "dual": None, "gain": 0.7, "start": 0.0, "stop": 2.0}]
+
+
+def found(f0_row, target, cents=30):
+    f0_row = f0_row[~np.isnan(f0_row)]
+    return np.any(np.abs(1200 * np.log2(f0_row / target)) < cents)
+
+
+def test_two_overlapping_horns():
+    y = render_mixture(HORNS, 2.0, 22050, snr_db=25, seed=1)
+    est = MultiPitch(22050).estimate(y)
+    for row in est["f0_hz"]:
+        assert found(row, 400) and found(row, 600)
+
+
+def test_wide_search_range():
+    # The noise-floor window around a fundamental reaches past both ends of the spectrum
+    y = render_mixture(HORNS, 2.0, 22050, snr_db=25, seed=1)
+    est = MultiPitch(22050, f_min=10, f_max=2000).estimate(y)
+    assert est["n_horns"].min() >= 1
+    assert all(found(row, 400) for row in est["f0_hz"])
+
+
+def test_dual_horn_counts_as_one_horn():
+    dual = [{"f0": 400.0, "dual": 500.0, "gain": 1.0, "start": 0.0, "stop": 2.0}]
+    y = render_mixture(dual, 2.0, 22050, snr_db=25, seed=1)
+    est = MultiPitch(22050).estimate(y)
+    assert (est["n_horns"] == 1).all()
+    for f0, partner in zip(est["f0_hz"][:, 0], est["dual_hz"][:, 0]):
+        assert {round(1200 * np.log2(f / 400) / 100) for f in (f0, partner)} == {0, 4}
+    assert (window_dissonance(est["f0_hz"]) == 0).all()
+
+
+def test_dual_horn_next_to_a_single_horn():
+    horns = [{"f0": 400.0, "dual": 500.0, "gain": 1.0, "start": 0.0, "stop": 2.0},
+             {"f0": 700.0, "dual": None, "gain": 0.7, "start": 0.0, "stop": 2.0}]
+    y = render_mixture(horns, 2.0, 22050, snr_db=25, seed=1)
+    est = MultiPitch(22050).estimate(y)
+    assert (est["n_horns"] == 2).all()
+    for row, duals in zip(est["f0_hz"], est["dual_hz"]):
+        assert found(row, 700)
+        assert np.isnan(duals[~np.isnan(row)]).sum() == 1
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from music_notes import format_notes, freq_to_note, freq_to_note_array
+
+
+@pytest.mark.parametrize("freq, note", [
+    (440.0, "A4 (+0 cents)"),
+    (261.63, "C4 (+0 cents)"),
+    (246.94, "B3 (+0 cents)"),
+    (493.88, "B4 (+0 cents)"),
+    (523.25, "C5 (+0 cents)"),
+    (0.0, "N/A"),
+])
+def test_freq_to_note(freq, note):
+    assert freq_to_note(freq) == note
+
+
+def test_array_matches_scalar():
+    freqs = np.array([0.0, np.nan, 300.0, 415.3, 440.0, 466.16, 800.0])
+    assert format_notes(freq_to_note_array(freqs)) == [freq_to_note(f) for f in freqs]
+
+
+@pytest.mark.parametrize("path", ["horn_data.csv", "horn_data_cleaned.csv",
+                                  "horn_data_expanded.csv", "horn_data_mega.csv"])
+def test_dataset_notes_match_code(path):
+    df = pd.read_csv(Path(__file__).resolve().parent.parent / path)
+    assert format_notes(freq_to_note_array(df["fundamental_hz"])) == df["fundamental_note"].tolist()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("librosa")
+
+import synthetic_horns as synth
+from analyze_horn import average_spectrum, pick_peaks
+from peak_engine import PeakEngine
+
+
+@pytest.fixture(scope="module")
+def spectra():
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(24):
+        kind = ("pure", "dual", "noise")[i % 3]
+        y = synth.honk_clip(kind, 1.5, 22050, f0=rng.uniform(250, 650), seed=i)
+        freqs, spectrum = average_spectrum(y, 22050)
+        rows.append(spectrum)
+    return freqs, np.array(rows, dtype=np.float32)
+
+
+@pytest.mark.parametrize("params", [None, {"prominence": 6}, {"height": -30, "distance": 8},
+                                    {"horn_max": 500, "dual_max": 1.4}])
+def test_pick_matches_pick_peaks(spectra, params):
+    freqs, matrix = spectra
+    picked = PeakEngine(matrix, freqs).pick(params)
+
+    for i, spectrum in enumerate(matrix):
+        expected = pick_peaks(freqs, spectrum, params)
+        if "error" in expected:
+            assert np.isnan(picked["fundamental_hz"][i])
+            continue
+        assert picked["fundamental_hz"][i] == expected["fundamental_hz"]
+        assert picked["n_harmonics"][i] == len(expected["harmonics"])
+        assert min(picked["n_peaks"][i], 10) == len(expected["all_peaks_hz"])  # reported up to 10
+        dual = expected["dual_horn"]
+        if dual is None:
+            assert np.isnan(picked["dual_hz"][i])
+        else:
+            assert picked["dual_hz"][i] == dual["frequency"]
+            assert picked["dual_ratio"][i] == pytest.approx(dual["ratio"])
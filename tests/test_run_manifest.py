@@ -0,0 +1,70 @@
+import json
+
+from run_manifest import DONE, FAILED, PENDING, RunManifest
+
+FILES = ["a.wav", "b.wav", "c.wav", "d.wav"]
+
+
+def lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replay_after_crash(tmp_path):
+    path = tmp_path / "out.csv.manifest.jsonl"
+    manifest = RunManifest(path, FILES, max_attempts=2)
+    assert manifest.to_run() == FILES
+    manifest.start("a.wav")
+    manifest.finish("a.wav")
+    manifest.start("b.wav")
+    manifest.fail("b.wav", "ValueError: bad file")
+    manifest.start("c.wav")  # process dies here
+    manifest.close()
+    with open(path, "a") as f:
+        f.write('{"file": "d.wa')  # torn last line
+
+    manifest = RunManifest(path, FILES, max_attempts=2, completed={"a.wav"})
+    assert manifest.entries["a.wav"]["status"] == DONE
+    assert manifest.entries["b.wav"] == {"status": FAILED, "attempts": 1, "error": "ValueError: bad file"}
+    assert manifest.entries["c.wav"]["status"] == FAILED
+    assert manifest.entries["c.wav"]["error"].startswith("interrupted")
+    assert manifest.entries["d.wav"]["status"] == PENDING
+    assert manifest.to_run() == ["b.wav", "c.wav", "d.wav"]
+    manifest.close()
+
+    # Compacted on open: one line per file
+    assert [entry["file"] for entry in lines(path)] == FILES
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    path = tmp_path / "m.jsonl"
+    for _ in range(2):
+        manifest = RunManifest(path, FILES, max_attempts=2)
+        for name in manifest.to_run():
+            manifest.start(name)
+            if name == "b.wav":
+                manifest.fail(name, "boom")
+            else:
+                manifest.finish(name)
+        done = {name for name, e in manifest.entries.items() if e["status"] == DONE}
+        manifest.close()
+
+    manifest = RunManifest(path, FILES, max_attempts=2, completed=done)
+    assert manifest.to_run() == []
+    assert manifest.counts() == {DONE: 3, FAILED: 0, PENDING: 0, "gave_up": 1}
+    manifest.close()
+
+
+def test_output_is_source_of_truth(tmp_path):
+    path = tmp_path / "m.jsonl"
+    manifest = RunManifest(path, FILES)
+    for name in FILES:
+        manifest.start(name)
+        manifest.finish(name)
+    manifest.close()
+
+    # Only a.wav's row reached the output before the crash
+    manifest = RunManifest(path, FILES, completed={"a.wav"})
+    assert manifest.to_run() == ["b.wav", "c.wav", "d.wav"]
+    assert manifest.entries["b.wav"]["attempts"] == 0
+    manifest.close()
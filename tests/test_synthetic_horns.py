@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import synthetic_horns as synth
+from validate_roundtrip import render_file
+
+HORNS = [{"f0": 400.0, "dual": 500.0, "gain": 1.0, "start": 0.2, "stop": 1.7},
+         {"f0": 333.0, "dual": None, "gain": 0.3, "start": 1.0, "stop": 3.0}]
+
+
+@pytest.mark.parametrize("block", [1000, 4096, 1 << 20])
+def test_blocks_match_whole_clip(block):
+    whole = synth.render_mixture(HORNS, 3.0, 22050, snr_db=12, seed=3)
+    blocks = list(synth.mixture_blocks(HORNS, 3.0, 22050, snr_db=12, seed=3, block=block))
+    assert max(len(b) for b in blocks) <= block
+    np.testing.assert_allclose(np.concatenate(blocks), whole, atol=2e-7)
+
+    noise = synth.traffic_noise(3.0, 22050, seed=5)
+    np.testing.assert_allclose(np.concatenate(list(synth.traffic_noise_blocks(3.0, 22050, seed=5, block=block))),
+                               noise, atol=2e-7)
+
+
+def test_render_file_writes_wav(tmp_path):
+    sf = pytest.importorskip("soundfile")
+    spec = {"filename": "mix.wav", "horns": HORNS, "snr_db": 12.0, "duration": 3.0, "sr": 22050, "seed": 3}
+    path = render_file(spec, str(tmp_path))
+    y, sr = sf.read(path, dtype="int16")
+    assert sr == 22050
+    expected = np.round(synth.render_mixture(HORNS, 3.0, 22050, 12.0, 3) * 32767)
+    assert np.abs(y - expected).max() <= 1
+
+
+def test_harmonic_sum_keeps_phase_late_in_long_clips():
+    sr, a = 44100, 44100 * 600  # ten minutes in
+    y = synth._harmonic_sum(440.0, (1.0,), a, a + 4096, sr)
+    expected = np.sin(2 * np.pi * 440.0 * np.arange(a, a + 4096) / sr)
+    np.testing.assert_allclose(y, expected, atol=1e-6)
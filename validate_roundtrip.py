@@ -0,0 +1,208 @@
+"""
+Round-trip validation: synthesize horn mixtures, analyze them, score.
+
+Renders realistic clips with known ground truth (one foreground horn drawn
+from horn_data_cleaned.csv, with its dual-horn third if it has one, plus
+quieter background horns and traffic rumble), writes them in parallel
+as 16-bit WAVs filled block by block through np.memmap (memory stays
+bounded for clips of any length), then runs the analyze_horn.py pipeline
+(load_audio -> find_horn_segment -> extract_frequencies) over them for
+each decode backend. Reports detection accuracy next to
+throughput, so a speed-up can be checked for an accuracy regression
+before it is merged.
+
+Usage:
+    python validate_roundtrip.py --files 200
+    python validate_roundtrip.py --files 2000 --workers 8 --max-horns 4 \\
+        --snr-db 0 20 --decoder librosa soxr native --out-dir /tmp/roundtrip
+    python validate_roundtrip.py --files 500 --adaptive both
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analyze_horn import DECODE_BACKENDS, analysis_n_fft, find_horn_segment, extract_frequencies, load_audio
+from synthetic_horns import mixture_blocks, open_wav_memmap
+
+
+def make_specs(fundamentals, duals, n_files: int, max_horns: int = 3, snr_range=(5.0, 25.0),
+               duration: float = 3.0, sr: int = 44100, seed: int = 42) -> list[dict]:
+    """
+    Draw one mixture description per file.
+
+    Horn 0 is the foreground horn (gain 1), and is the ground truth for
+    the file. Up to max_horns - 1 background horns play at -6 to -20 dB.
+    """
+    rng = np.random.default_rng(seed)
+    specs = []
+    for i in range(n_files):
+        horns = []
+        for k in range(rng.integers(1, max_horns + 1)):
+            j = rng.integers(len(fundamentals))
+            start = rng.uniform(0.2, 0.8)
+            horns.append({
+                "f0": float(fundamentals[j]),
+                "dual": None if np.isnan(duals[j]) else float(duals[j]),
+                "gain": 1.0 if k == 0 else float(10 ** (rng.uniform(-20, -6) / 20)),
+                "start": start,
+                "stop": min(duration, start + rng.uniform(0.6, 1.8)),
+            })
+        specs.append({
+            "filename": f"mix_{i:06d}.wav",
+            "horns": horns,
+            "snr_db": float(rng.uniform(*snr_range)),
+            "duration": duration,
+            "sr": sr,
+            "seed": seed + i,
+        })
+    return specs
+
+
+def render_file(spec: dict, out_dir: str) -> str:
+    """Render one mixture block by block straight into a memory-mapped WAV."""
+    path = os.path.join(out_dir, spec["filename"])
+    data = open_wav_memmap(path, int(round(spec["duration"] * spec["sr"])), spec["sr"])
+    pos = 0
+    for y in mixture_blocks(spec["horns"], spec["duration"], spec["sr"], spec["snr_db"], spec["seed"]):
+        data[pos:pos + len(y)] = np.round(y * 32767).astype(np.int16)
+        pos += len(y)
+    data.flush()
+    del data
+    return path
+
+
+def synthesize(specs: list[dict], out_dir: str, n_workers: int = 1) -> float:
+    """Write every mixture to out_dir; returns elapsed seconds."""
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    if n_workers > 1:
+        with ProcessPoolExecutor(n_workers) as pool:
+            list(pool.map(render_file, specs, [out_dir] * len(specs), chunksize=16))
+    else:
+        for spec in specs:
+            render_file(spec, out_dir)
+    return time.perf_counter() - t0
+
+
+def analyze_clip(path: str, backend: str = "librosa", adaptive: bool = False) -> tuple[float, float]:
+    """Run the analyze_horn.py pipeline on one file; returns (fundamental, dual) Hz, NaN if absent."""
+    y, sr = load_audio(path, backend=backend)
+    start, end = find_horn_segment(y, sr)
+    results = extract_frequencies(y[start:end], sr, analysis_n_fft(sr), adaptive=adaptive)
+    if "error" in results:
+        return np.nan, np.nan
+    dual = results.get("dual_horn")
+    return results["fundamental_hz"], dual["frequency"] if dual else np.nan
+
+
+def _analyze_many(paths: list[str], backend: str, adaptive: bool) -> list[tuple[float, float]]:
+    return [analyze_clip(p, backend, adaptive) for p in paths]
+
+
+def analyze_all(paths: list[str], backend: str, n_workers: int = 1,
+                adaptive: bool = False) -> tuple[np.ndarray, float]:
+    """Analyze every file; returns an (n, 2) array of (fundamental, dual) and elapsed seconds."""
+    analyze_clip(paths[0], backend, adaptive)  # warm-up: imports, FFT plans, resampler setup
+    t0 = time.perf_counter()
+    if n_workers > 1:
+        shares = np.array_split(np.array(paths), n_workers * 4)
+        with ProcessPoolExecutor(n_workers) as pool:
+            parts = pool.map(_analyze_many, [list(s) for s in shares], [backend] * len(shares),
+                             [adaptive] * len(shares))
+            estimates = [e for part in parts for e in part]
+    else:
+        estimates = _analyze_many(paths, backend, adaptive)
+    return np.array(estimates, dtype=float).reshape(-1, 2), time.perf_counter() - t0
+
+
+def score(specs: list[dict], estimates: np.ndarray, tolerance_cents: float = 50) -> dict:
+    """Compare estimates against each spec's foreground horn."""
+    truth_f0 = np.array([s["horns"][0]["f0"] for s in specs])
+    truth_dual = np.array([s["horns"][0]["dual"] or np.nan for s in specs], dtype=float)
+    est_f0, est_dual = estimates[:, 0], estimates[:, 1]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cents = np.abs(1200 * np.log2(est_f0 / truth_f0))
+        # Either horn of a dual pair may come out loudest, so accept the dual as fundamental
+        cents_alt = np.abs(1200 * np.log2(est_f0 / truth_dual))
+        dual_cents = np.abs(1200 * np.log2(np.maximum(est_f0, est_dual) /
+                                           np.fmax(truth_f0, truth_dual)))
+    cents = np.where(np.isnan(cents), np.inf, cents)
+    cents = np.fmin(cents, cents_alt)
+
+    has_dual = ~np.isnan(truth_dual)
+    found_dual = ~np.isnan(est_dual)
+    both = has_dual & found_dual
+    return {
+        "accuracy": float((cents <= tolerance_cents).mean()),
+        "median_cents": float(np.median(cents)),
+        "dual_detection": float((has_dual == found_dual).mean()),
+        "dual_pitch_accuracy": float((dual_cents[both] <= tolerance_cents).mean()) if both.any() else np.nan,
+        "false_dual_rate": float(found_dual[~has_dual].mean()) if (~has_dual).any() else np.nan,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthesize horn mixtures and validate the analysis pipeline")
+    parser.add_argument("--data", default="horn_data_cleaned.csv", help="Horn dataset to draw horns from")
+    parser.add_argument("--files", "-n", type=int, default=200, help="Number of mixtures")
+    parser.add_argument("--max-horns", type=int, default=3, help="Max simultaneous horns per clip")
+    parser.add_argument("--snr-db", type=float, nargs=2, default=(5.0, 25.0), metavar=("MIN", "MAX"),
+                        help="Foreground horn to traffic noise ratio range (dB)")
+    parser.add_argument("--duration", type=float, default=3.0, help="Clip length (s)")
+    parser.add_argument("--sr", type=int, default=44100, help="Sample rate of the rendered WAVs")
+    parser.add_argument("--decoder", nargs="+", choices=DECODE_BACKENDS, default=["librosa"],
+                        help="Decode backends to validate")
+    parser.add_argument("--adaptive", choices=("off", "on", "both"), default="off",
+                        help="Use analyze_horn's adaptive STFT (both: report each)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for synthesis and analysis")
+    parser.add_argument("--tolerance-cents", type=float, default=50,
+                        help="Fundamental error counted as correct")
+    parser.add_argument("--out-dir", help="Keep the WAVs here (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    specs = make_specs(df["fundamental_hz"].values, df["dual_horn"].values, args.files,
+                       max_horns=args.max_horns, snr_range=args.snr_db, duration=args.duration,
+                       sr=args.sr, seed=args.seed)
+
+    tmp = None if args.out_dir else tempfile.TemporaryDirectory()
+    out_dir = args.out_dir or tmp.name
+    try:
+        elapsed = synthesize(specs, out_dir, args.workers)
+        audio_s = args.files * args.duration
+        print(f"Synthesized {args.files} mixtures ({audio_s / 60:.1f} min of audio) in {elapsed:.1f}s "
+              f"({args.files / elapsed:.0f} files/s) -> {out_dir}")
+
+        paths = [os.path.join(out_dir, s["filename"]) for s in specs]
+        rows = []
+        modes = {"off": [False], "on": [True], "both": [False, True]}[args.adaptive]
+        for backend in args.decoder:
+            for adaptive in modes:
+                estimates, elapsed = analyze_all(paths, backend, args.workers, adaptive)
+                rows.append({
+                    "decoder": backend,
+                    "adaptive": adaptive,
+                    "files_per_s": args.files / elapsed,
+                    "realtime_x": audio_s / elapsed,
+                    **score(specs, estimates, args.tolerance_cents),
+                })
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    print(f"\nAccuracy vs throughput ({args.workers} worker(s), tolerance {args.tolerance_cents:.0f} cents):")
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()